@@ -1,5 +1,8 @@
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -84,12 +87,70 @@ WSGI_APPLICATION = "confiture.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# CONFITURE_DATABASE selects the backend: "sqlite" (default, for single-node
+# installs) or "postgres", configured by the usual POSTGRES_* variables.
+CONFITURE_DATABASE = os.environ.get("CONFITURE_DATABASE", "sqlite")
+
+if CONFITURE_DATABASE == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "confiture"),
+            "USER": os.environ.get("POSTGRES_USER", "confiture"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        }
+    }
+    # With POSTGRES_POOL_MAX_SIZE set, connections come from a psycopg pool
+    # (requires the "postgres" extra). Otherwise each worker keeps its
+    # connection open for POSTGRES_CONN_MAX_AGE seconds.
+    if pool_max_size := int(os.environ.get("POSTGRES_POOL_MAX_SIZE", "0")):
+        DATABASES["default"]["OPTIONS"] = {
+            "pool": {
+                "min_size": int(os.environ.get("POSTGRES_POOL_MIN_SIZE", "2")),
+                "max_size": pool_max_size,
+                "timeout": int(os.environ.get("POSTGRES_POOL_TIMEOUT", "10")),
+            }
+        }
+    else:
+        DATABASES["default"]["CONN_MAX_AGE"] = int(
+            os.environ.get("POSTGRES_CONN_MAX_AGE", "60")
+        )
+        DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+elif CONFITURE_DATABASE == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("SQLITE_PATH", str(BASE_DIR / "db.sqlite3")),
+            "OPTIONS": {
+                # WAL lets readers continue while a write is in progress, and
+                # taking the write lock when a transaction starts avoids
+                # "database is locked" errors on lock upgrades.
+                "init_command": "PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL",
+                "transaction_mode": "IMMEDIATE",
+                # busy_timeout, in seconds
+                "timeout": 20,
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unknown CONFITURE_DATABASE {CONFITURE_DATABASE!r}")
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# Rendered config tables are cached under a version kept in the database, so
+# each process may cache in memory. Set REDIS_URL (requires the "redis" extra)
+# to share the cache between processes instead.
+if redis_url := os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": redis_url,
+        }
     }
-}
 
 
 # Password validation
@@ -142,5 +203,39 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Seconds to wait after a config change before pushing it to the targets.
+# Further changes within this window postpone the push, but never longer than
+# CONFITURE_SYNC_MAX_DELAY seconds after the first change.
+CONFITURE_SYNC_DEBOUNCE = 5
+CONFITURE_SYNC_MAX_DELAY = 60
+
+# HTTP requests of adapters. Idempotent requests are retried
+# CONFITURE_ADAPTER_RETRIES times. After CONFITURE_ADAPTER_BREAKER_THRESHOLD
+# consecutive failures a host is not contacted for
+# CONFITURE_ADAPTER_BREAKER_RESET seconds.
+CONFITURE_ADAPTER_CONNECT_TIMEOUT = 5
+CONFITURE_ADAPTER_READ_TIMEOUT = 30
+CONFITURE_ADAPTER_RETRIES = 2
+CONFITURE_ADAPTER_BREAKER_THRESHOLD = 5
+CONFITURE_ADAPTER_BREAKER_RESET = 30
+
+# Secret values are encrypted with data keys, which are in turn encrypted with
+# the first of these master keys. The others are only used to decrypt data
+# keys that were not rewrapped yet (see the rotate_keys command). They are
+# independent of SECRET_KEY, so that can be rotated without losing secrets.
+if "CONFITURE_MASTER_KEYS" in os.environ:
+    CONFITURE_MASTER_KEYS = os.environ["CONFITURE_MASTER_KEYS"].split(",")
+elif DEBUG:
+    # Only for development, anyone can decrypt secrets with it
+    CONFITURE_MASTER_KEYS = ["confiture-insecure-development-master-key"]
+else:
+    raise ImproperlyConfigured("CONFITURE_MASTER_KEYS must be set")
+
+# The watch API (which needs the ASGI application) checks for new snapshot
+# versions every CONFITURE_WATCH_POLL_INTERVAL seconds, and sends idle
+# clients a keepalive every CONFITURE_WATCH_KEEPALIVE seconds.
+CONFITURE_WATCH_POLL_INTERVAL = 1
+CONFITURE_WATCH_KEEPALIVE = 15
+
 COTTON_SNAKE_CASED_NAMES = False
 LUCIDE_ICONS_DIR = BASE_DIR / "templates" / "icons"
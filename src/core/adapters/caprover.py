@@ -1,93 +1,230 @@
+import asyncio
+import hashlib
 import json
-from typing import Any
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable
 
 import httpx
 from django import forms
 
-from core.models import ConfigItem
+from .http import make_timeout, send
+from .spec import AdapterError, AdapterWarning, compute_delta, hookimpl
 
-from .spec import AdapterError, AdapterWarning, hookimpl
+# Lifetime of a cached login token. CapRover tokens are valid for much longer,
+# but renewing them from time to time keeps password changes effective.
+TOKEN_TTL = 60 * 60
+
+# CapRover answers most API calls with HTTP 200 and reports errors in the body.
+STATUS_AUTH_TOKEN_INVALID = 1105
+
+
+def is_auth_error(response: httpx.Response) -> bool:
+    if response.status_code == 401:
+        return True
+
+    try:
+        data = response.json()
+    except ValueError:
+        return False
+
+    return isinstance(data, dict) and data.get("status") == STATUS_AUTH_TOKEN_INVALID
+
+
+class TokenCache:
+    """
+    Login tokens per CapRover instance, shared by all adapters in the process.
+
+    Concurrent adapters needing the same token wait for a single login instead
+    of each logging in on their own.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.tokens: dict[tuple[str, str], tuple[str, float]] = {}
+        # asyncio locks must not be shared between event loops
+        self.locks = weakref.WeakKeyDictionary()
+
+    def lookup(self, key) -> str | None:
+        token, expires_at = self.tokens.get(key, (None, 0))
+        if expires_at <= time.monotonic():
+            return None
+
+        return token
+
+    async def get(self, key, login: Callable[[], Awaitable[str]]) -> str:
+        token = self.lookup(key)
+        if token is not None:
+            return token
+
+        locks = self.locks.setdefault(asyncio.get_running_loop(), {})
+        async with locks.setdefault(key, asyncio.Lock()):
+            token = self.lookup(key)
+            if token is None:
+                token = await login()
+                self.tokens[key] = (token, time.monotonic() + self.ttl)
+
+        return token
+
+    def invalidate(self, key, token: str):
+        """
+        Drop `token`, unless another adapter already replaced it.
+        """
+        if self.tokens.get(key, (None, 0))[0] == token:
+            del self.tokens[key]
+
+    def clear(self):
+        self.tokens.clear()
+
+
+token_cache = TokenCache(ttl=TOKEN_TTL)
 
 
 class CapRoverForm(forms.Form):
     url = forms.URLField()
+    password = forms.CharField()
+    app = forms.CharField()
 
 
 class CapRoverAdapter:
-    Form = None
+    Form = CapRoverForm
 
-    def __init__(self):
+    def __init__(self, client: httpx.AsyncClient | None = None):
+        self.client = client
         self.caprover_url = None
         self.caprover_password = None
         self.caprover_app = None
 
-    @hookimpl
-    async def pull(self) -> list[ConfigItem]:
+    @asynccontextmanager
+    async def get_client(self):
         """
-        Pull ConfigItem objects from the target.
+        Use the shared client if one was given, otherwise a short-lived one.
         """
-        return []
+        if self.client is not None:
+            yield self.client
+            return
+
+        async with httpx.AsyncClient(timeout=make_timeout()) as client:
+            yield client
+
+    async def get_app_definition(self, client: httpx.AsyncClient) -> dict[str, Any]:
+        response = await self.request(client, "GET", "/api/v2/user/apps/appDefinitions")
+        data = response.json()
+        app_definitions = data["data"]["appDefinitions"]
+
+        app_definition = None
+        for app_definition in app_definitions:
+            if app_definition.get("appName") == self.caprover_app:
+                break
+        else:
+            raise AdapterError(f"No app named {self.caprover_app!r} found")
+
+        if app_definition is None:
+            raise AdapterError(
+                f"Failed to get app definition for app named {self.caprover_app!r}"
+            )
+
+        return app_definition
 
     @hookimpl
-    async def push(self, items: list[ConfigItem]) -> list[AdapterWarning]:
+    async def pull(self) -> dict[str, str]:
+        """
+        Fetch the env vars of the app.
         """
-        Push ConfigItem objects to the target.
+        async with self.get_client() as client:
+            app_definition = await self.get_app_definition(client)
+
+        return {
+            env_var["key"]: env_var["value"] for env_var in app_definition["envVars"]
+        }
+
+    @property
+    def token_cache_key(self) -> tuple[str, str]:
+        password_hash = hashlib.sha256(self.caprover_password.encode()).hexdigest()
+        return self.caprover_url, password_hash
+
+    async def login(self, client: httpx.AsyncClient) -> str:
+        response = await send(
+            client,
+            "POST",
+            f"{self.caprover_url}/api/v2/login",
+            json={"password": self.caprover_password},
+            headers={
+                "X-Namespace": "captain",
+            },
+            idempotent=True,
+        )
+        if response.status_code != 200:
+            raise AdapterError("Failed to log in")
+
+        data = response.json()
+        return data["data"]["token"]
+
+    async def request(
+        self, client: httpx.AsyncClient, method: str, path: str, **kwargs
+    ) -> httpx.Response:
         """
+        Send an authenticated request to the CapRover API.
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.caprover_url}/api/v2/login",
-                json={"password": self.caprover_password},
-                headers={
-                    "X-Namespace": "captain",
-                },
+        The login token is shared between all adapters talking to the same
+        CapRover instance. If it was rejected, log in again and retry once.
+        See `send` for timeouts, retries and the circuit breaker.
+        """
+        headers = kwargs.pop("headers", {})
+        for _ in range(2):
+            token = await token_cache.get(
+                self.token_cache_key, lambda: self.login(client)
             )
-            if response.status_code != 200:
-                raise AdapterError("Failed to log in")
-
-            data = response.json()
-            token = data["data"]["token"]
-
-            # get app definitions
-            response = await client.get(
-                f"{self.caprover_url}/api/v2/user/apps/appDefinitions",
+            response = await send(
+                client,
+                method,
+                f"{self.caprover_url}{path}",
                 headers={
+                    **headers,
                     "X-Namespace": "captain",
                     "X-Captain-Auth": token,
                 },
+                **kwargs,
             )
-            data = response.json()
-            app_definitions = data["data"]["appDefinitions"]
+            if not is_auth_error(response):
+                break
 
-            app_definition = None
-            for app_definition in app_definitions:
-                if app_definition.get("appName") == self.caprover_app:
-                    break
-            else:
-                raise AdapterError(f"No app named {self.caprover_app!r} found")
+            token_cache.invalidate(self.token_cache_key, token)
 
-            if app_definition is None:
-                raise AdapterError(
-                    f"Failed to get app definition for app named {self.caprover_app!r}"
-                )
+        return response
+
+    @hookimpl
+    async def push(self, values: dict[str, str]) -> list[AdapterWarning]:
+        """
+        Make the env vars of the app match `values`.
+
+        The app definition is only updated (which redeploys the app) if the
+        env vars actually differ.
+        """
+
+        async with self.get_client() as client:
+            app_definition = await self.get_app_definition(client)
 
             env_vars = {
                 env_var["key"]: env_var["value"]
                 for env_var in app_definition["envVars"]
             }
-            env_vars["bla"] = "blub"
+            if not compute_delta(env_vars, values):
+                return []
+
             app_definition["envVars"] = [
-                {"key": key, "value": value} for key, value in env_vars.items()
+                {"key": key, "value": value} for key, value in values.items()
             ]
 
             # Update app definition via POST request to caprover API
-            response = await client.post(
-                f"{self.caprover_url}/api/v2/user/apps/appDefinitions/update",
+            response = await self.request(
+                client,
+                "POST",
+                "/api/v2/user/apps/appDefinitions/update",
                 content=json.dumps(app_definition),
                 headers={
                     "Content-Type": "application/json",
-                    "X-Namespace": "captain",
-                    "X-Captain-Auth": token,
                 },
             )
 
@@ -98,25 +235,14 @@ class CapRoverAdapter:
                     response.text,
                 )
 
+        return []
+
     @hookimpl
     async def configure(self, config: dict[str, Any]):
         """
         Configure this adapter.
         """
-        self.caprover_url = config["url"]
+        self.caprover_url = config["url"].rstrip("/")
         self.caprover_password = config["password"]
         self.caprover_app = config["app"]
 
-
-if __name__ == "__main__":
-    import asyncio
-
-    from core.models import AdapterConfig
-
-    ac = AdapterConfig.objects.first()
-
-    async def main():
-        adapter = await CapRoverAdapter().configure(config=ac.config)
-        await adapter.push()
-
-    asyncio.run(main())
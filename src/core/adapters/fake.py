@@ -0,0 +1,81 @@
+import asyncio
+import json
+import secrets
+from collections import Counter
+
+import httpx
+
+from .caprover import STATUS_AUTH_TOKEN_INVALID
+
+
+class FakeCapRover:
+    """
+    In-memory stand-in for the parts of the CapRover API used by
+    CapRoverAdapter.
+
+    Use `transport()` as the transport of an httpx.AsyncClient. Every request
+    is delayed by `latency` seconds to mimic a remote server.
+    """
+
+    def __init__(
+        self,
+        *,
+        apps: int = 1,
+        variables: int = 0,
+        latency: float = 0.0,
+        password: str = "captain",
+    ):
+        self.latency = latency
+        self.password = password
+        self.tokens: set[str] = set()
+        self.calls = Counter()
+        self.apps = {
+            self.app_name(i): {
+                "appName": self.app_name(i),
+                "envVars": [
+                    {"key": f"VAR_{j}", "value": f"value-{j}"} for j in range(variables)
+                ],
+            }
+            for i in range(apps)
+        }
+
+    @staticmethod
+    def app_name(index: int) -> str:
+        return f"app-{index}"
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        path = request.url.path
+        self.calls[path] += 1
+
+        if path == "/api/v2/login":
+            if json.loads(request.content).get("password") != self.password:
+                return httpx.Response(401)
+
+            token = secrets.token_hex(16)
+            self.tokens.add(token)
+            return httpx.Response(200, json={"status": 100, "data": {"token": token}})
+
+        if request.headers.get("X-Captain-Auth") not in self.tokens:
+            return httpx.Response(200, json={"status": STATUS_AUTH_TOKEN_INVALID})
+
+        if path == "/api/v2/user/apps/appDefinitions":
+            return httpx.Response(
+                200,
+                json={
+                    "status": 100,
+                    "data": {"appDefinitions": list(self.apps.values())},
+                },
+            )
+
+        if path == "/api/v2/user/apps/appDefinitions/update":
+            app_definition = json.loads(request.content)
+            self.apps[app_definition["appName"]] = app_definition
+            return httpx.Response(200, json={"status": 100})
+
+        return httpx.Response(404)
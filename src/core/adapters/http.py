@@ -0,0 +1,151 @@
+import asyncio
+import random
+import time
+
+import httpx
+from django.conf import settings
+
+from .metrics import count_http_call
+from .spec import AdapterError
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Responses that mean "try again later" rather than "this request is wrong"
+RETRY_STATUS_CODES = {502, 503, 504}
+
+RETRY_BACKOFF_BASE = 0.5
+
+
+class CircuitOpenError(AdapterError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Fails fast for a host after `threshold` consecutive failed requests.
+
+    After `reset_timeout` seconds a single trial request is let through. If it
+    succeeds, the circuit closes again, otherwise it stays open for another
+    `reset_timeout` seconds.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def before_request(self):
+        if not self.is_open:
+            return
+
+        if self.trial_running or time.monotonic() - self.opened_at < self.reset_timeout:
+            raise CircuitOpenError("Target is unavailable, not trying again yet")
+
+        self.trial_running = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_running or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self.trial_running = False
+
+    def release_trial(self):
+        # A trial that ended without success or failure, e.g. because it was
+        # cancelled, must not keep the circuit open forever.
+        self.trial_running = False
+
+
+class CircuitBreakers:
+    """
+    One circuit breaker per host, shared by all adapters in the process.
+    """
+
+    def __init__(self):
+        self.breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, host: str) -> CircuitBreaker:
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(
+                threshold=settings.CONFITURE_ADAPTER_BREAKER_THRESHOLD,
+                reset_timeout=settings.CONFITURE_ADAPTER_BREAKER_RESET,
+            )
+
+        return breaker
+
+    def clear(self):
+        self.breakers.clear()
+
+
+circuit_breakers = CircuitBreakers()
+
+
+def make_timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        settings.CONFITURE_ADAPTER_READ_TIMEOUT,
+        connect=settings.CONFITURE_ADAPTER_CONNECT_TIMEOUT,
+    )
+
+
+def retry_delay(attempt: int) -> float:
+    return random.uniform(0, RETRY_BACKOFF_BASE * 2**attempt)
+
+
+async def send(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    *,
+    idempotent: bool | None = None,
+    **kwargs,
+) -> httpx.Response:
+    """
+    Send a request through the circuit breaker of the target host.
+
+    Idempotent requests (by default those with an idempotent method) are
+    retried with jittered backoff after connection errors, timeouts and
+    gateway errors.
+    """
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+
+    retries = settings.CONFITURE_ADAPTER_RETRIES if idempotent else 0
+    breaker = circuit_breakers.get(httpx.URL(url).netloc.decode())
+
+    for attempt in range(retries + 1):
+        breaker.before_request()
+        count_http_call()
+
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            breaker.record_failure()
+            error = e
+        else:
+            if response.status_code not in RETRY_STATUS_CODES:
+                breaker.record_success()
+                return response
+
+            breaker.record_failure()
+            error = None
+        finally:
+            breaker.release_trial()
+
+        if attempt < retries:
+            await asyncio.sleep(retry_delay(attempt))
+
+    if error is not None:
+        raise AdapterError(f"{method} {url} failed: {error!r}") from error
+
+    return response
@@ -0,0 +1,132 @@
+import bisect
+import time
+from contextvars import ContextVar
+
+from attrs import define, field
+from django.db import transaction
+
+from core.models import AdapterConfig, AdapterMetric
+
+# Upper bounds (in seconds) of the duration buckets; the last bucket is
+# unbounded.
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+@define
+class HookStats:
+    calls: int = 0
+    errors: int = 0
+    http_calls: int = 0
+    total_seconds: float = 0
+    max_seconds: float = 0
+    buckets: list[int] = field(factory=lambda: [0] * (len(BUCKETS) + 1))
+
+    def observe(self, seconds: float, *, error: bool, http_calls: int):
+        self.calls += 1
+        self.errors += error
+        self.http_calls += http_calls
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+
+def percentile(buckets: list[int], p: float) -> float | None:
+    """
+    Upper bound of the bucket containing the `p`th percentile (0 < p <= 1),
+    or None if it is in the unbounded bucket.
+    """
+    threshold = p * sum(buckets)
+    seen = 0
+    for bound, count in zip(BUCKETS, buckets):
+        seen += count
+        if seen >= threshold:
+            return bound
+
+    return None
+
+
+class Metrics:
+    """
+    Hook timings collected in this process, until they are flushed to the
+    database.
+    """
+
+    def __init__(self):
+        self.stats: dict[tuple[int, str], HookStats] = {}
+
+    def observe(self, adapter_config_id: int, hook: str, seconds: float, **kwargs):
+        key = (adapter_config_id, hook)
+        if key not in self.stats:
+            self.stats[key] = HookStats()
+
+        self.stats[key].observe(seconds, **kwargs)
+
+    def flush(self):
+        """
+        Add the collected stats to the AdapterMetric rows and reset them.
+        """
+        stats, self.stats = self.stats, {}
+        existing_ids = set(
+            AdapterConfig.objects.filter(
+                id__in={adapter_config_id for adapter_config_id, _ in stats}
+            ).values_list("id", flat=True)
+        )
+
+        with transaction.atomic():
+            for (adapter_config_id, hook), hook_stats in stats.items():
+                if adapter_config_id not in existing_ids:
+                    continue
+
+                metric, _ = AdapterMetric.objects.select_for_update().get_or_create(
+                    adapter_config_id=adapter_config_id,
+                    hook=hook,
+                )
+                metric.calls += hook_stats.calls
+                metric.errors += hook_stats.errors
+                metric.http_calls += hook_stats.http_calls
+                metric.total_seconds += hook_stats.total_seconds
+                metric.max_seconds = max(metric.max_seconds, hook_stats.max_seconds)
+                metric.buckets = [
+                    a + b
+                    for a, b in zip(
+                        metric.buckets or [0] * len(hook_stats.buckets),
+                        hook_stats.buckets,
+                    )
+                ]
+                metric.save()
+
+
+metrics = Metrics()
+
+# Number of HTTP requests sent by the hook call running in the current task
+http_calls: ContextVar[list[int] | None] = ContextVar("http_calls", default=None)
+
+
+def count_http_call():
+    counter = http_calls.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+async def call_hook(adapter, adapter_config: AdapterConfig, hook: str, **kwargs):
+    """
+    Call `hook` of `adapter`, recording its duration, HTTP requests and
+    whether it failed.
+    """
+    counter = [0]
+    token = http_calls.set(counter)
+    start = time.perf_counter()
+    error = True
+    try:
+        result = await getattr(adapter, hook)(**kwargs)
+        error = False
+        return result
+    finally:
+        metrics.observe(
+            adapter_config.id,
+            hook,
+            time.perf_counter() - start,
+            error=error,
+            http_calls=counter[0],
+        )
+        http_calls.reset(token)
@@ -0,0 +1,99 @@
+import functools
+import json
+from importlib.metadata import entry_points
+from typing import Any
+
+import pluggy
+from django.utils.module_loading import import_string
+
+from core.models import AdapterConfig
+
+from .spec import AdapterError, AdapterSpec
+
+ENTRY_POINT_GROUP = "confiture.adapters"
+
+# Adapters shipped with confiture. Other packages can provide adapters through
+# the "confiture.adapters" entry point group, e.g.
+#
+#     [project.entry-points."confiture.adapters"]
+#     dokku = "confiture_dokku.adapter:DokkuAdapter"
+BUILTIN_ADAPTERS = {
+    "caprover": "core.adapters.caprover.CapRoverAdapter",
+}
+
+# Every adapter class is registered here when it is first used, which checks
+# its hook implementations against AdapterSpec.
+plugin_manager = pluggy.PluginManager("confiture")
+plugin_manager.add_hookspecs(AdapterSpec)
+
+
+@functools.cache
+def get_adapter_paths() -> dict[str, str]:
+    """
+    Map the name of every known adapter to the dotted path of its class.
+
+    Entry points are only listed here, their modules are not imported.
+    """
+    paths = dict(BUILTIN_ADAPTERS)
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        paths[entry_point.name] = entry_point.value.replace(":", ".")
+
+    return paths
+
+
+def get_adapter_class(cls: str) -> type:
+    """
+    Import the adapter class given by name or dotted path.
+    """
+    return import_adapter_class(get_adapter_paths().get(cls, cls))
+
+
+@functools.cache
+def import_adapter_class(path: str) -> type:
+    try:
+        Adapter = import_string(path)
+    except ImportError as e:
+        raise AdapterError(f"Unknown adapter {path!r}") from e
+
+    # The same class may be reachable through another path
+    if not plugin_manager.is_registered(Adapter):
+        try:
+            plugin_manager.register(Adapter, name=path)
+        except pluggy.PluginValidationError as e:
+            # register() leaves the invalid plugin registered
+            plugin_manager.unregister(Adapter)
+            raise AdapterError(f"Invalid adapter {path!r}: {e}") from e
+
+    return Adapter
+
+
+def clean_config(Adapter: type, config: dict[str, Any]) -> dict[str, Any]:
+    """
+    Validate `config` with the adapter's form, if it has one.
+    """
+    if Adapter.Form is None:
+        return config
+
+    form = Adapter.Form(data=config)
+    if not form.is_valid():
+        raise AdapterError("Invalid adapter config", form.errors.get_json_data())
+
+    return {**config, **form.cleaned_data}
+
+
+@functools.lru_cache(maxsize=1024)
+def _load_adapter(cls: str, config_json: str) -> tuple[type, dict[str, Any]]:
+    Adapter = get_adapter_class(cls)
+    return Adapter, clean_config(Adapter, json.loads(config_json))
+
+
+def load_adapter(adapter_config: AdapterConfig) -> tuple[type, dict[str, Any]]:
+    """
+    Return the adapter class and the validated config of an adapter config.
+
+    The result is cached until the row's class or config changes.
+    """
+    config_json = json.dumps(adapter_config.config, sort_keys=True)
+    Adapter, config = _load_adapter(adapter_config.cls, config_json)
+    # callers may modify the config, the cached one must stay intact
+    return Adapter, dict(config)
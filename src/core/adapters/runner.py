@@ -0,0 +1,185 @@
+import asyncio
+from typing import Awaitable, Callable, Iterable
+
+import httpx
+from asgiref.sync import sync_to_async
+from attrs import define, field
+
+from core.models import AdapterConfig, AdapterPushState, Environment
+from core.reconcile import ReconcileSummary, reconcile_environment
+from core.snapshots import get_snapshot
+
+from .http import make_timeout
+from .metrics import call_hook
+from .registry import load_adapter
+from .spec import AdapterError, AdapterWarning, content_hash
+
+DEFAULT_CONCURRENCY = 10
+
+
+@define
+class AdapterResult:
+    adapter_config: AdapterConfig
+    warnings: list[AdapterWarning] = field(factory=list)
+    error: Exception | None = None
+    skipped: bool = False
+    summary: ReconcileSummary | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def make_client(concurrency: int = DEFAULT_CONCURRENCY, **kwargs) -> httpx.AsyncClient:
+    """
+    Create a client whose connection pool is shared by all pushes of one run.
+    """
+    kwargs.setdefault("timeout", make_timeout())
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=concurrency,
+            max_keepalive_connections=concurrency,
+        ),
+        **kwargs,
+    )
+
+
+def get_environment_id(adapter_config: AdapterConfig):
+    if adapter_config.environment_id is None:
+        raise AdapterError(f"Adapter config {adapter_config.id} has no environment")
+
+    return adapter_config.environment_id
+
+
+async def get_adapter(adapter_config: AdapterConfig, *, client: httpx.AsyncClient):
+    Adapter, config = load_adapter(adapter_config)
+    adapter = Adapter(client=client)
+    await call_hook(adapter, adapter_config, "configure", config=config)
+    return adapter
+
+
+async def push_one(
+    adapter_config: AdapterConfig,
+    *,
+    client: httpx.AsyncClient,
+    force: bool = False,
+) -> AdapterResult:
+    """
+    Push the values of the adapter config's environment to its target.
+
+    The push is skipped if the values did not change since the last
+    successful push, unless `force` is set. It fails while some values can't
+    be resolved.
+    """
+    environment_id = get_environment_id(adapter_config)
+
+    snapshot = await sync_to_async(get_snapshot)(environment_id)
+    if snapshot.errors:
+        raise AdapterError(
+            f"Environment {environment_id} has values that can't be resolved: "
+            + ", ".join(sorted(snapshot.errors))
+        )
+
+    values = await sync_to_async(snapshot.get_values)()
+    values_hash = snapshot.content_hash
+
+    if not force:
+        is_unchanged = await AdapterPushState.objects.filter(
+            adapter_config=adapter_config,
+            environment_id=environment_id,
+            content_hash=values_hash,
+        ).aexists()
+        if is_unchanged:
+            return AdapterResult(adapter_config=adapter_config, skipped=True)
+
+    adapter = await get_adapter(adapter_config, client=client)
+    warnings = await call_hook(adapter, adapter_config, "push", values=values)
+
+    await AdapterPushState.objects.aupdate_or_create(
+        adapter_config=adapter_config,
+        environment_id=environment_id,
+        defaults={"content_hash": values_hash},
+    )
+
+    return AdapterResult(adapter_config=adapter_config, warnings=warnings or [])
+
+
+async def pull_one(
+    adapter_config: AdapterConfig,
+    *,
+    client: httpx.AsyncClient,
+    prune: bool = False,
+) -> AdapterResult:
+    """
+    Import the values on the adapter config's target into its environment.
+
+    Values missing on the target are only deleted if `prune` is set.
+    """
+    environment_id = get_environment_id(adapter_config)
+    adapter = await get_adapter(adapter_config, client=client)
+    values = await call_hook(adapter, adapter_config, "pull")
+
+    environment = await Environment.objects.aget(id=environment_id)
+    summary = await sync_to_async(reconcile_environment)(
+        environment, values, prune=prune
+    )
+
+    if prune:
+        # The environment now mirrors the target, so there is nothing to push.
+        await AdapterPushState.objects.aupdate_or_create(
+            adapter_config=adapter_config,
+            environment_id=environment_id,
+            defaults={"content_hash": content_hash(values)},
+        )
+
+    return AdapterResult(adapter_config=adapter_config, summary=summary)
+
+
+async def run_all(
+    adapter_configs: Iterable[AdapterConfig],
+    run_one: Callable[..., Awaitable[AdapterResult]],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    **kwargs,
+) -> list[AdapterResult]:
+    """
+    Run `run_one` for all given adapter configs concurrently on the running
+    event loop.
+
+    At most `concurrency` calls are in flight at any time. A failing target
+    does not affect the others; its exception is recorded on its result.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with make_client(concurrency) as client:
+
+        async def run(adapter_config):
+            async with semaphore:
+                try:
+                    return await run_one(adapter_config, client=client, **kwargs)
+                except Exception as e:
+                    return AdapterResult(adapter_config=adapter_config, error=e)
+
+        return await asyncio.gather(*(run(ac) for ac in adapter_configs))
+
+
+async def push_all(
+    adapter_configs: Iterable[AdapterConfig],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    force: bool = False,
+) -> list[AdapterResult]:
+    return await run_all(
+        adapter_configs, push_one, concurrency=concurrency, force=force
+    )
+
+
+async def pull_all(
+    adapter_configs: Iterable[AdapterConfig],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    prune: bool = False,
+) -> list[AdapterResult]:
+    return await run_all(
+        adapter_configs, pull_one, concurrency=concurrency, prune=prune
+    )
@@ -1,9 +1,9 @@
+import hashlib
+import json
 from typing import Any
 
 import pluggy
-from attrs import define
-
-from core.models import ConfigItem
+from attrs import define, field
 
 hookspec = pluggy.HookspecMarker("confiture")
 hookimpl = pluggy.HookimplMarker("confiture")
@@ -19,6 +19,36 @@ class AdapterWarning:
     message: str
 
 
+@define
+class Delta:
+    """
+    Changes needed to turn the values on a target into the desired values.
+    """
+
+    added: dict[str, str] = field(factory=dict)
+    changed: dict[str, str] = field(factory=dict)
+    removed: list[str] = field(factory=list)
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+
+def compute_delta(current: dict[str, str], desired: dict[str, str]) -> Delta:
+    return Delta(
+        added={k: v for k, v in desired.items() if k not in current},
+        changed={k: v for k, v in desired.items() if k in current and current[k] != v},
+        removed=sorted(k for k in current if k not in desired),
+    )
+
+
+def content_hash(values: dict[str, str]) -> str:
+    """
+    Order independent hash of a set of values.
+    """
+    payload = json.dumps(sorted(values.items()), separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
 class AdapterSpec:
     """
     An adapter for a particular system (i.e. CapRover) knows how to read and
@@ -30,16 +60,18 @@ class AdapterSpec:
     Form = None
 
     @hookspec
-    async def pull(self) -> list[ConfigItem]:
+    async def pull(self) -> dict[str, str]:
         """
-        Pull ConfigItem objects from the target.
+        Fetch the values (item name to value) currently set on the target.
         """
-        return []
 
     @hookspec
-    async def push(self, items: list[ConfigItem]):
+    async def push(self, values: dict[str, str]) -> list[AdapterWarning]:
         """
-        Push ConfigItem objects to the target.
+        Make the values on the target match `values` (item name to value).
+
+        Implementations should leave the target untouched if it already holds
+        exactly these values.
         """
 
     @hookspec
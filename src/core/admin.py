@@ -1,6 +1,14 @@
 from django.contrib import admin
 
-from .models import ConfigItem, Environment, Organization, Profile, Project, Service
+from .models import (
+    ApiToken,
+    ConfigItem,
+    Environment,
+    Organization,
+    Profile,
+    Project,
+    Service,
+)
 
 
 @admin.register(Profile)
@@ -31,3 +39,13 @@ class EnvironmentAdmin(admin.ModelAdmin):
 @admin.register(ConfigItem)
 class ConfigItemAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(ApiToken)
+class ApiTokenAdmin(admin.ModelAdmin):
+    # Tokens are created with the create_api_token command
+    list_display = ["name", "project", "created_at"]
+    readonly_fields = ["project", "digest"]
+
+    def has_add_permission(self, request):
+        return False
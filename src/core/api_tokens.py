@@ -0,0 +1,30 @@
+import hashlib
+import secrets
+
+from core.models import ApiToken, Project
+
+TOKEN_PREFIX = "cft_"
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def create_token(project: Project, name: str) -> tuple[ApiToken, str]:
+    """
+    Create an API token for `project`. Returns the saved token and its
+    value, which can't be recovered later.
+    """
+    token = TOKEN_PREFIX + secrets.token_urlsafe(32)
+    api_token = ApiToken.objects.create(
+        project=project, name=name, digest=hash_token(token)
+    )
+    return api_token, token
+
+
+def get_bearer_token(request) -> str | None:
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+
+    return token.strip()
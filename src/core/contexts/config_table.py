@@ -0,0 +1,106 @@
+from django.db.models import F, FilteredRelation, Q
+from django.utils.translation import gettext_lazy as _
+
+from core.crypto import unseal
+from core.models import ConfigItem, ConfigItemValue, Environment
+from core.types import ConfigTable, ConfigTableRow
+
+
+def get_environments(org, project, service):
+    environments = Environment.objects.filter(
+        service=service,
+        service__project=project,
+        service__project__organization=org,
+    ).order_by("name")
+    return environments
+
+
+def get_items(org, project, service):
+    return ConfigItem.objects.filter(
+        service=service,
+        service__project=project,
+        service__project__organization=org,
+    ).order_by("name")
+
+
+def get_item_values(items):
+    return ConfigItemValue.objects.filter(item_id__in=items)
+
+
+def get_config_table(org, project, service, environments) -> ConfigTable:
+    items = get_items(org, project, service)
+
+    values_dict = {
+        (item_value.item_id, item_value.environment_id): item_value
+        for item_value in get_item_values(items)
+    }
+
+    rows = [
+        ConfigTableRow(
+            item=item,
+            values=[values_dict.get((item.id, env.id)) for env in environments],
+        )
+        for item in items
+    ]
+
+    return ConfigTable(
+        headers=[
+            _("Name"),
+            *[e.name for e in environments],
+        ],
+        rows=rows,
+    )
+
+
+# Rows of the environment page loaded at a time
+ENVIRONMENT_PAGE_SIZE = 200
+
+
+def get_environment_config_table(environment, after) -> ConfigTable:
+    """
+    Return the items of the environment's service with their value in the
+    environment, ordered by name and starting after the name `after`.
+
+    Runs a single query, joining the items with the environment's values.
+    """
+    items = (
+        ConfigItem.objects.filter(service_id=environment.service_id)
+        .annotate(
+            environment_value=FilteredRelation(
+                "configitemvalue",
+                condition=Q(configitemvalue__environment=environment),
+            ),
+            value_id=F("environment_value__id"),
+            stored_value=F("environment_value__value"),
+        )
+        .order_by("name")
+    )
+    if after:
+        items = items.filter(name__gt=after)
+
+    items = list(items[: ENVIRONMENT_PAGE_SIZE + 1])
+    has_more = len(items) > ENVIRONMENT_PAGE_SIZE
+    items = items[:ENVIRONMENT_PAGE_SIZE]
+
+    rows = [
+        ConfigTableRow(
+            item=item,
+            values=[
+                ConfigItemValue(
+                    id=item.value_id,
+                    item=item,
+                    environment=environment,
+                    value=unseal(item.stored_value),
+                )
+                if item.value_id is not None
+                else None
+            ],
+        )
+        for item in items
+    ]
+
+    return ConfigTable(
+        headers=[_("Name"), environment.name],
+        rows=rows,
+        next_after=items[-1].name if has_more else None,
+    )
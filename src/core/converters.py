@@ -0,0 +1,38 @@
+from sqids import Sqids
+
+
+class SqidConverter:
+    prefix = "id-"
+    alphabet = "abcdefghkmnopqrstuvwxyz23456789"
+
+    def __init__(self):
+        self.sqids = Sqids(alphabet=self.alphabet, min_length=4)
+        self.regex = f"{self.prefix}[a-zA-Z0-9]*"
+
+    def to_python(self, value):
+        value = value.removeprefix(self.prefix)
+        decoded_value, *rest = self.sqids.decode(value)
+        if rest:
+            raise ValueError()
+
+        return decoded_value
+
+    def to_url(self, value):
+        encoded_value = self.sqids.encode([int(value)])
+        return f"{self.prefix}{encoded_value}"
+
+
+class OrgIdConverter(SqidConverter):
+    prefix = "o-"
+
+
+class ProjectIdConverter(SqidConverter):
+    prefix = "p-"
+
+
+class ServiceIdConverter(SqidConverter):
+    prefix = "s-"
+
+
+class EnvironmentIdConverter(SqidConverter):
+    prefix = "e-"
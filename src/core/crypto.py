@@ -0,0 +1,182 @@
+import base64
+import hashlib
+import os
+import re
+from functools import cache, lru_cache
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Sealed values look like "enc:1:<data key id>:<base64 of nonce + ciphertext>"
+SEALED_RE = re.compile(r"enc:1:(\d+):([A-Za-z0-9_-]+=*)")
+
+# Plain text values starting with "enc:" are stored behind this prefix, so they
+# are never taken for sealed ones.
+PLAIN_PREFIX = "enc:0:"
+
+NONCE_SIZE = 12
+
+# Unwrapped data keys kept in memory. Only a few keys are in use at a time,
+# so this merely bounds memory after many rotations.
+DATA_KEY_CACHE_SIZE = 64
+
+
+class DecryptionError(Exception):
+    pass
+
+
+def encrypt(key: bytes, plaintext: bytes, associated_data: bytes | None = None):
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + AESGCM(key).encrypt(nonce, plaintext, associated_data)
+
+
+def decrypt(key: bytes, ciphertext: bytes, associated_data: bytes | None = None):
+    try:
+        return AESGCM(key).decrypt(
+            ciphertext[:NONCE_SIZE], ciphertext[NONCE_SIZE:], associated_data
+        )
+    except InvalidTag as e:
+        raise DecryptionError("Invalid key or corrupted ciphertext") from e
+
+
+@cache
+def derive_master_key(secret: str) -> tuple[str, bytes]:
+    """
+    Return the id and the AES key derived from a CONFITURE_MASTER_KEYS entry.
+    """
+    key = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"confiture master key",
+    ).derive(secret.encode())
+    return hashlib.sha256(key).hexdigest()[:16], key
+
+
+def get_master_keys() -> dict[str, bytes]:
+    """
+    Return the master keys by id. The first one wraps new data keys, the
+    others are only used to unwrap existing ones.
+    """
+    if not settings.CONFITURE_MASTER_KEYS:
+        raise ImproperlyConfigured("CONFITURE_MASTER_KEYS must not be empty")
+
+    return dict(map(derive_master_key, settings.CONFITURE_MASTER_KEYS))
+
+
+def get_current_master_key() -> tuple[str, bytes]:
+    return derive_master_key(settings.CONFITURE_MASTER_KEYS[0])
+
+
+def wrap_data_key(key: bytes) -> tuple[str, str]:
+    """
+    Encrypt a data key with the current master key.
+
+    Returns the master key id and the wrapped key.
+    """
+    master_key_id, master_key = get_current_master_key()
+    wrapped_key = encrypt(master_key, key, b"confiture data key")
+    return master_key_id, base64.b64encode(wrapped_key).decode()
+
+
+def unwrap_data_key(data_key) -> bytes:
+    master_key = get_master_keys().get(data_key.master_key_id)
+    if master_key is None:
+        raise DecryptionError(
+            f"Data key {data_key.id} is wrapped with unknown master key "
+            f"{data_key.master_key_id}"
+        )
+
+    return decrypt(
+        master_key, base64.b64decode(data_key.wrapped_key), b"confiture data key"
+    )
+
+
+@lru_cache(maxsize=DATA_KEY_CACHE_SIZE)
+def get_data_key(data_key_id: int) -> bytes:
+    DataKey = apps.get_model("core", "DataKey")
+    try:
+        data_key = DataKey.objects.get(id=data_key_id)
+    except DataKey.DoesNotExist as e:
+        raise DecryptionError(f"Unknown data key {data_key_id}") from e
+
+    return unwrap_data_key(data_key)
+
+
+def create_data_key():
+    """
+    Create a new data key, which becomes the one new values are sealed with.
+    """
+    DataKey = apps.get_model("core", "DataKey")
+    master_key_id, wrapped_key = wrap_data_key(AESGCM.generate_key(bit_length=256))
+    return DataKey.objects.create(master_key_id=master_key_id, wrapped_key=wrapped_key)
+
+
+def get_active_data_key_id() -> int:
+    DataKey = apps.get_model("core", "DataKey")
+    data_key_id = DataKey.objects.order_by("-id").values_list("id", flat=True).first()
+    if data_key_id is None:
+        data_key_id = create_data_key().id
+
+    return data_key_id
+
+
+def is_sealed(value: str) -> bool:
+    return SEALED_RE.fullmatch(value) is not None
+
+
+def escape(value: str) -> str:
+    """
+    Return how a value that isn't encrypted is stored.
+    """
+    return PLAIN_PREFIX + value if value.startswith("enc:") else value
+
+
+def seal_many(values: list[str], data_key_id: int | None = None) -> list[str]:
+    """
+    Encrypt `values` with the given data key, by default the active one.
+    """
+    if not values:
+        return []
+
+    if data_key_id is None:
+        data_key_id = get_active_data_key_id()
+    key = get_data_key(data_key_id)
+    return [
+        f"enc:1:{data_key_id}:"
+        + base64.urlsafe_b64encode(encrypt(key, value.encode())).decode()
+        for value in values
+    ]
+
+
+def seal(value: str, data_key_id: int | None = None) -> str:
+    return seal_many([value], data_key_id)[0]
+
+
+def unseal(value: str) -> str:
+    """
+    Decrypt a sealed value, or unescape one that isn't sealed.
+    """
+    if value.startswith(PLAIN_PREFIX):
+        return value.removeprefix(PLAIN_PREFIX)
+
+    match = SEALED_RE.fullmatch(value)
+    if match is None:
+        return value
+
+    data_key_id, ciphertext = match.groups()
+    key = get_data_key(int(data_key_id))
+    return decrypt(key, base64.urlsafe_b64decode(ciphertext)).decode()
+
+
+def unseal_values(values: dict[str, str]) -> dict[str, str]:
+    return {name: unseal(value) for name, value in values.items()}
+
+
+def clear_caches():
+    get_data_key.cache_clear()
@@ -0,0 +1,60 @@
+import re
+
+# KEY=value, optionally prefixed with "export " as in .envrc files
+LINE_RE = re.compile(r"\s*(?:export\s+)?([A-Za-z_][A-Za-z0-9_.-]*)\s*=\s*(.*)")
+
+ESCAPES = {"n": "\n", "r": "\r", "t": "\t", '"': '"', "\\": "\\", "$": "$"}
+
+
+class DotenvError(ValueError):
+    pass
+
+
+def unescape(value: str) -> str:
+    return re.sub(r"\\(.)", lambda m: ESCAPES.get(m.group(1), m.group(0)), value)
+
+
+def parse_dotenv(content: str) -> dict[str, str]:
+    """
+    Parse the contents of a .env or .envrc file.
+
+    Supports comments, `export` prefixes, single quoted (literal) and double
+    quoted (escaped, possibly multi-line) values. Later assignments of a name
+    win, like in a shell.
+    """
+    values = {}
+    lines = iter(enumerate(content.splitlines(), start=1))
+
+    for line_number, line in lines:
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+
+        match = LINE_RE.fullmatch(line)
+        if match is None:
+            raise DotenvError(f"Line {line_number}: expected NAME=value")
+
+        name, value = match.groups()
+        quote = value[:1]
+
+        if quote in ("'", '"'):
+            start_line = line_number
+            value = value[1:]
+            # a quoted value ends at the next unescaped quote, maybe lines later
+            end = re.compile(rf"^((?:[^{quote}\\]|\\.)*){quote}\s*(?:#.*)?$", re.S)
+            while (end_match := end.match(value)) is None:
+                try:
+                    line_number, line = next(lines)
+                except StopIteration:
+                    raise DotenvError(f"Line {start_line}: unterminated quote")
+                value += "\n" + line
+
+            value = end_match.group(1)
+            if quote == '"':
+                value = unescape(value)
+        else:
+            # unquoted values end at a comment
+            value = re.split(r"\s+#", value, maxsplit=1)[0].strip()
+
+        values[name] = value
+
+    return values
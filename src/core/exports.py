@@ -0,0 +1,261 @@
+import base64
+import json
+import re
+from functools import partial
+from typing import AsyncIterator, Callable, Iterable, Iterator
+
+from asgiref.sync import sync_to_async
+from attrs import frozen
+from django.core.handlers.asgi import ASGIRequest
+
+from core.crypto import unseal
+from core.models import EnvironmentSnapshot
+from core.snapshots import rebuild_snapshots
+
+# Bytes of output collected before they are sent
+CHUNK_SIZE = 64 * 1024
+
+# Snapshots fetched from the database at a time
+SNAPSHOT_BATCH_SIZE = 20
+
+SAFE_VALUE_RE = re.compile(r"[A-Za-z0-9_./:@+,=-]*")
+
+
+@frozen
+class ExportedEnvironment:
+    service_name: str
+    environment_name: str
+    # (name, value) pairs, ordered by name
+    values: list[tuple[str, str]]
+
+
+@frozen
+class ExportFormat:
+    content_type: str
+    extension: str
+    # Turns the exported environments into lines of text. Exports of a single
+    # environment leave out the service and environment names.
+    write: Callable[[Iterable[ExportedEnvironment], bool], Iterator[str]]
+
+
+def iter_environments(environments) -> Iterator[ExportedEnvironment]:
+    """
+    Yield the resolved and decrypted values of the given environments, one
+    environment at a time.
+    """
+    missing = environments.filter(environmentsnapshot__isnull=True)
+    rebuild_snapshots(missing.values_list("id", flat=True))
+
+    snapshots = (
+        EnvironmentSnapshot.objects.filter(environment__in=environments)
+        .select_related("environment__service")
+        .order_by("environment__service__name", "environment__name")
+    )
+    for snapshot in snapshots.iterator(chunk_size=SNAPSHOT_BATCH_SIZE):
+        yield get_exported_environment(snapshot)
+
+
+def get_exported_environment(snapshot: EnvironmentSnapshot) -> ExportedEnvironment:
+    return ExportedEnvironment(
+        service_name=snapshot.environment.service.name,
+        environment_name=snapshot.environment.name,
+        values=[(name, unseal(value)) for name, value in sorted(snapshot.data.items())],
+    )
+
+
+def chunked(lines: Iterable[str], size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    buffer = []
+    buffered = 0
+    for line in lines:
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= size:
+            yield "".join(buffer).encode()
+            buffer = []
+            buffered = 0
+
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def header(environment: ExportedEnvironment, is_first: bool, single: bool) -> str:
+    if single:
+        return ""
+
+    separator = "" if is_first else "\n"
+    return f"{separator}# {environment.service_name}/{environment.environment_name}\n"
+
+
+def quote_dotenv(value: str) -> str:
+    if SAFE_VALUE_RE.fullmatch(value):
+        return value
+
+    escaped = (
+        value.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("$", "\\$")
+        .replace("\n", "\\n")
+    )
+    return f'"{escaped}"'
+
+
+def quote_shell(value: str) -> str:
+    if SAFE_VALUE_RE.fullmatch(value):
+        return value
+
+    return "'" + value.replace("'", "'\\''") + "'"
+
+
+def write_env(environments, single, *, prefix="", quote=quote_dotenv):
+    for i, environment in enumerate(environments):
+        yield header(environment, i == 0, single)
+        for name, value in environment.values:
+            yield f"{prefix}{name}={quote(value)}\n"
+
+
+def write_envrc(environments, single):
+    return write_env(environments, single, prefix="export ", quote=quote_shell)
+
+
+def write_docker(environments, single):
+    # docker --env-file takes values literally and has no multi-line values
+    for i, environment in enumerate(environments):
+        yield header(environment, i == 0, single)
+        for name, value in environment.values:
+            if "\n" in value:
+                yield f"# {name} skipped, it has multiple lines\n"
+            else:
+                yield f"{name}={value}\n"
+
+
+def write_json_values(environment):
+    yield "{"
+    for i, (name, value) in enumerate(environment.values):
+        yield f"{',' if i else ''}{json.dumps(name)}:{json.dumps(value)}"
+    yield "}"
+
+
+def write_json(environments, single):
+    if single:
+        for environment in environments:
+            yield from write_json_values(environment)
+        yield "\n"
+        return
+
+    # {"service": {"environment": {"NAME": "value"}}}
+    current_service = None
+    yield "{"
+    for environment in environments:
+        if environment.service_name != current_service:
+            if current_service is not None:
+                yield "},"
+            yield f"{json.dumps(environment.service_name)}:{{"
+            is_first_environment = True
+            current_service = environment.service_name
+
+        if not is_first_environment:
+            yield ","
+        is_first_environment = False
+
+        yield f"{json.dumps(environment.environment_name)}:"
+        yield from write_json_values(environment)
+
+    if current_service is not None:
+        yield "}"
+    yield "}\n"
+
+
+def write_yaml(environments, single):
+    # JSON strings are valid YAML flow scalars, so they need no extra escaping
+    if single:
+        for environment in environments:
+            if not environment.values:
+                yield "{}\n"
+            for name, value in environment.values:
+                yield f"{json.dumps(name)}: {json.dumps(value)}\n"
+        return
+
+    current_service = None
+    for environment in environments:
+        if environment.service_name != current_service:
+            yield f"{json.dumps(environment.service_name)}:\n"
+            current_service = environment.service_name
+
+        yield f"  {json.dumps(environment.environment_name)}:"
+        yield "\n" if environment.values else " {}\n"
+        for name, value in environment.values:
+            yield f"    {json.dumps(name)}: {json.dumps(value)}\n"
+
+
+def kubernetes_name(environment: ExportedEnvironment) -> str:
+    name = f"{environment.service_name}-{environment.environment_name}".lower()
+    return re.sub(r"[^a-z0-9-]+", "-", name).strip("-")[:253]
+
+
+def write_kubernetes(environments, single, *, kind):
+    for i, environment in enumerate(environments):
+        if i:
+            yield "---\n"
+        yield "apiVersion: v1\n"
+        yield f"kind: {kind}\n"
+        yield "metadata:\n"
+        yield f"  name: {kubernetes_name(environment)}\n"
+        if kind == "Secret":
+            yield "type: Opaque\n"
+        yield "data:" + ("\n" if environment.values else " {}\n")
+        for name, value in environment.values:
+            if kind == "Secret":
+                value = base64.b64encode(value.encode()).decode()
+            yield f"  {json.dumps(name)}: {json.dumps(value)}\n"
+
+
+FORMATS = {
+    "env": ExportFormat("text/plain", "env", write_env),
+    "envrc": ExportFormat("text/plain", "envrc", write_envrc),
+    "docker": ExportFormat("text/plain", "env", write_docker),
+    "json": ExportFormat("application/json", "json", write_json),
+    "yaml": ExportFormat("application/yaml", "yaml", write_yaml),
+    "configmap": ExportFormat(
+        "application/yaml",
+        "yaml",
+        partial(write_kubernetes, kind="ConfigMap"),
+    ),
+    "secret": ExportFormat(
+        "application/yaml",
+        "yaml",
+        partial(write_kubernetes, kind="Secret"),
+    ),
+}
+
+
+def export(environments, format: str, *, single: bool = False) -> Iterator[bytes]:
+    """
+    Stream the values of a queryset of environments in one of FORMATS.
+    """
+    return chunked(FORMATS[format].write(iter_environments(environments), single))
+
+
+async def aexport(
+    environments, format: str, *, single: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    Like `export()`, producing each chunk in the thread sync code runs in.
+    """
+    chunks = export(environments, format, single=single)
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+
+def export_for(
+    request, environments, format: str, *, single: bool = False
+) -> Iterator[bytes] | AsyncIterator[bytes]:
+    """
+    Return `export()` for a StreamingHttpResponse to `request`. ASGI servers
+    read synchronous iterators to the end before sending anything, so they
+    get `aexport()`.
+    """
+    if isinstance(request, ASGIRequest):
+        return aexport(environments, format, single=single)
+
+    return export(environments, format, single=single)
@@ -0,0 +1,14 @@
+from django.db.models import F
+
+from core.models import Service
+
+
+def bump_service_versions(service_ids):
+    """
+    Invalidate the fragments cached for the given services, which are keyed
+    on their `config_version`.
+    """
+    if service_ids:
+        Service.objects.filter(id__in=service_ids).update(
+            config_version=F("config_version") + 1
+        )
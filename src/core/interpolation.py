@@ -0,0 +1,58 @@
+import re
+
+from attrs import frozen
+
+# ${NAME} is replaced by the value of NAME, $${ by a literal ${
+PLACEHOLDER_RE = re.compile(r"\$\$\{|\$\{([A-Za-z_][A-Za-z0-9_.-]*)\}")
+
+
+@frozen
+class Template:
+    # The literal text around the placeholders, one more than `placeholders`
+    literals: tuple[str, ...]
+    # The names of the placeholders, in order of appearance
+    placeholders: tuple[str, ...]
+    # The names the template depends on
+    names: frozenset[str]
+    # Whether the source contains $${, so rendering it changes it even
+    # without placeholders
+    has_escapes: bool = False
+
+    def render(self, values: dict[str, str]) -> str:
+        """
+        Fill in the placeholders. Those of names not in `values` are kept as
+        written.
+        """
+        parts = [self.literals[0]]
+        for name, literal in zip(self.placeholders, self.literals[1:]):
+            parts.append(values.get(name, f"${{{name}}}"))
+            parts.append(literal)
+
+        return "".join(parts)
+
+
+def compile_template(source: str) -> Template:
+    literals = []
+    placeholders = []
+    literal = []
+    position = 0
+    has_escapes = False
+    for match in PLACEHOLDER_RE.finditer(source):
+        literal.append(source[position : match.start()])
+        if match.group(1) is None:
+            literal.append("${")
+            has_escapes = True
+        else:
+            literals.append("".join(literal))
+            placeholders.append(match.group(1))
+            literal = []
+        position = match.end()
+
+    literal.append(source[position:])
+    literals.append("".join(literal))
+    return Template(
+        literals=tuple(literals),
+        placeholders=tuple(placeholders),
+        names=frozenset(placeholders),
+        has_escapes=has_escapes,
+    )
@@ -0,0 +1,169 @@
+import random
+from datetime import timedelta
+from typing import Iterable
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from core.models import AdapterConfig, SyncJob
+
+MAX_ATTEMPTS = 5
+
+# Retry delays grow exponentially from BACKOFF_BASE up to BACKOFF_MAX seconds.
+BACKOFF_BASE = 5
+BACKOFF_MAX = 10 * 60
+
+# Running jobs not finished after this long belong to a dead worker.
+STALE_AFTER = timedelta(minutes=15)
+
+
+def enqueue_sync(
+    environment_ids: Iterable[int],
+    *,
+    delay: float = 0,
+    max_delay: float | None = None,
+) -> int:
+    """
+    Queue a push for every adapter config of the given environments, due in
+    `delay` seconds.
+
+    Adapter configs that already have a pending job are not queued again.
+    Instead, their job is postponed to run `delay` seconds from now, unless it
+    was created more than `max_delay` seconds ago. That way a burst of changes
+    results in a single push shortly after the last change.
+
+    Returns the number of adapter configs concerned.
+    """
+    now = timezone.now()
+    run_after = now + timedelta(seconds=delay)
+    environment_ids = list(environment_ids)
+    targets = AdapterConfig.objects.filter(
+        environment_id__in=environment_ids
+    ).values_list("id", "environment_id")
+
+    jobs = [
+        SyncJob(
+            adapter_config_id=adapter_config_id,
+            environment_id=environment_id,
+            run_after=run_after,
+        )
+        for adapter_config_id, environment_id in targets
+    ]
+    if not jobs:
+        return 0
+
+    SyncJob.objects.bulk_create(jobs, ignore_conflicts=True)
+
+    if delay:
+        postponable = SyncJob.objects.filter(
+            status=SyncJob.Status.PENDING,
+            environment_id__in=environment_ids,
+            run_after__lt=run_after,
+        )
+        if max_delay is not None:
+            postponable = postponable.filter(
+                created_at__gte=now - timedelta(seconds=max_delay)
+            )
+        postponable.update(run_after=run_after)
+
+    return len(jobs)
+
+
+def claim_jobs(worker_id: str, limit: int) -> list[SyncJob]:
+    """
+    Mark up to `limit` due jobs as running for `worker_id` and return them.
+
+    Any number of workers can claim concurrently without getting the same job.
+    """
+    now = timezone.now()
+    running = SyncJob.objects.filter(
+        adapter_config=OuterRef("adapter_config"),
+        environment=OuterRef("environment"),
+        status=SyncJob.Status.RUNNING,
+    )
+    # A target is never pushed by two workers at once.
+    due = (
+        SyncJob.objects.filter(status=SyncJob.Status.PENDING, run_after__lte=now)
+        .exclude(Exists(running))
+        .order_by("run_after")
+    )
+    claim = dict(
+        status=SyncJob.Status.RUNNING,
+        locked_by=worker_id,
+        locked_at=now,
+        attempts=F("attempts") + 1,
+    )
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            due = due.select_for_update(skip_locked=True)
+            ids = list(due.values_list("id", flat=True)[:limit])
+            SyncJob.objects.filter(id__in=ids).update(**claim)
+    else:
+        # Without SKIP LOCKED (SQLite), claim job by job. The status check in
+        # the update makes sure only one worker wins each job.
+        ids = []
+        for job_id in due.values_list("id", flat=True)[:limit]:
+            candidate = SyncJob.objects.filter(id=job_id, status=SyncJob.Status.PENDING)
+            if candidate.update(**claim):
+                ids.append(job_id)
+
+    return list(
+        SyncJob.objects.filter(id__in=ids)
+        .select_related("adapter_config")
+        .order_by("run_after")
+    )
+
+
+def complete_job(job: SyncJob):
+    SyncJob.objects.filter(id=job.id).delete()
+
+
+def backoff(attempts: int) -> float:
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return random.uniform(delay / 2, delay)
+
+
+def fail_job(job: SyncJob, error: str):
+    """
+    Schedule a retry of `job`, or give up on it after MAX_ATTEMPTS.
+    """
+    if job.attempts >= MAX_ATTEMPTS:
+        SyncJob.objects.filter(id=job.id).update(
+            status=SyncJob.Status.FAILED,
+            last_error=error,
+        )
+        return
+
+    try:
+        with transaction.atomic():
+            SyncJob.objects.filter(id=job.id).update(
+                status=SyncJob.Status.PENDING,
+                run_after=timezone.now() + timedelta(seconds=backoff(job.attempts)),
+                last_error=error,
+            )
+    except IntegrityError:
+        # A newer job for the same target is already pending and will do.
+        SyncJob.objects.filter(id=job.id).delete()
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Give running jobs of workers that died another chance.
+    """
+    stale = SyncJob.objects.filter(
+        status=SyncJob.Status.RUNNING,
+        locked_at__lt=timezone.now() - STALE_AFTER,
+    )
+    pending = SyncJob.objects.filter(
+        adapter_config=OuterRef("adapter_config"),
+        environment=OuterRef("environment"),
+        status=SyncJob.Status.PENDING,
+    )
+
+    with transaction.atomic():
+        count = stale.exclude(Exists(pending)).update(status=SyncJob.Status.PENDING)
+        stale.delete()
+
+    return count
@@ -0,0 +1,97 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from core.adapters.metrics import percentile
+from core.models import AdapterMetric
+
+
+def format_ms(seconds: float) -> str:
+    return f"{seconds * 1000:.0f}"
+
+
+def row_percentile(row, p: float) -> float:
+    # the bucket bound can overshoot, but never the slowest call
+    bound = percentile(row["buckets"], p)
+    if bound is None:
+        return row["max_seconds"]
+
+    return min(bound, row["max_seconds"])
+
+
+class Command(BaseCommand):
+    help = "Show how long adapter hooks take, per adapter config or class."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--by-class",
+            action="store_true",
+            help="Aggregate the stats of all adapter configs of an adapter class.",
+        )
+        parser.add_argument(
+            "--hook",
+            help="Only show stats of this hook (configure, pull or push).",
+        )
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Delete the shown stats after printing them.",
+        )
+
+    def handle(self, *args, **options):
+        metrics = AdapterMetric.objects.select_related("adapter_config")
+        if options["hook"]:
+            metrics = metrics.filter(hook=options["hook"])
+
+        rows = defaultdict(
+            lambda: {
+                "calls": 0,
+                "errors": 0,
+                "http_calls": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0,
+                "buckets": [],
+            }
+        )
+        for metric in metrics:
+            adapter_config = metric.adapter_config
+            if options["by_class"]:
+                key = (adapter_config.cls, metric.hook)
+            else:
+                key = (f"{adapter_config.id} {adapter_config.cls}", metric.hook)
+
+            row = rows[key]
+            row["calls"] += metric.calls
+            row["errors"] += metric.errors
+            row["http_calls"] += metric.http_calls
+            row["total_seconds"] += metric.total_seconds
+            row["max_seconds"] = max(row["max_seconds"], metric.max_seconds)
+            row["buckets"] = [
+                a + b
+                for a, b in zip(
+                    row["buckets"] or [0] * len(metric.buckets), metric.buckets
+                )
+            ]
+
+        self.stdout.write(
+            f"{'adapter':<50}{'hook':<11}{'calls':>8}{'errors':>8}{'http/call':>10}"
+            f"{'mean ms':>9}{'p50 ms':>8}{'p95 ms':>8}{'max ms':>8}{'total s':>9}"
+        )
+
+        # slowest targets first
+        for (adapter, hook), row in sorted(
+            rows.items(), key=lambda item: item[1]["total_seconds"], reverse=True
+        ):
+            calls = row["calls"] or 1
+            self.stdout.write(
+                f"{adapter[:49]:<50}{hook:<11}{row['calls']:>8}{row['errors']:>8}"
+                f"{row['http_calls'] / calls:>10.1f}"
+                f"{format_ms(row['total_seconds'] / calls):>9}"
+                f"{format_ms(row_percentile(row, 0.5)):>8}"
+                f"{format_ms(row_percentile(row, 0.95)):>8}"
+                f"{format_ms(row['max_seconds']):>8}"
+                f"{row['total_seconds']:>9.1f}"
+            )
+
+        if options["reset"]:
+            metrics.delete()
@@ -0,0 +1,128 @@
+import asyncio
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.adapters.caprover import CapRoverAdapter, token_cache
+from core.adapters.fake import FakeCapRover
+from core.adapters.runner import DEFAULT_CONCURRENCY, make_client
+
+FAKE_URL = "http://caprover.invalid"
+
+
+def percentile(samples: list[float], p: float) -> float:
+    if len(samples) == 1:
+        return samples[0]
+
+    return statistics.quantiles(samples, n=100, method="inclusive")[p - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark CapRoverAdapter push and pull against a local fake CapRover "
+        "with N apps x M variables."
+    )
+
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--apps", type=int, default=50, help="Number of apps.")
+        parser.add_argument(
+            "--vars", type=int, default=100, help="Number of variables per app."
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=5.0,
+            help="Simulated latency per HTTP request in milliseconds.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=DEFAULT_CONCURRENCY,
+            help="Maximum number of concurrent adapter calls.",
+        )
+        parser.add_argument(
+            "--rounds", type=int, default=3, help="Number of rounds per operation."
+        )
+
+    def handle(self, *args, **options):
+        if options["apps"] < 1 or options["rounds"] < 1:
+            raise CommandError("--apps and --rounds must be at least 1")
+
+        asyncio.run(self.run(**options))
+
+    async def run(self, *, apps, latency, concurrency, rounds, **options):
+        variables = options["vars"]
+        fake = FakeCapRover(apps=apps, variables=variables, latency=latency / 1000)
+        token_cache.clear()
+
+        def values(index, round):
+            env_vars = fake.apps[fake.app_name(index)]["envVars"]
+            values = {env_var["key"]: env_var["value"] for env_var in env_vars}
+            values["BENCH_ROUND"] = str(round)
+            return values
+
+        async def push(adapter, index, round):
+            await adapter.push(values=values(index, round))
+
+        async def push_unchanged(adapter, index, round):
+            # the values of the last "push" round are already on the target
+            await adapter.push(values=values(index, rounds - 1))
+
+        async def pull(adapter, index, round):
+            await adapter.pull()
+
+        operations = {
+            "push": push,
+            "push (no-op)": push_unchanged,
+            "pull": pull,
+        }
+
+        self.stdout.write(
+            f"{apps} apps x {variables} variables, {latency:g} ms latency, "
+            f"concurrency {concurrency}, {rounds} rounds"
+        )
+        self.stdout.write(
+            f"{'operation':<14}{'ops':>8}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'max ms':>10}{'ops/s':>10}{'requests':>10}"
+        )
+
+        async with make_client(concurrency, transport=fake.transport()) as client:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def timed(operation, index, round):
+                async with semaphore:
+                    adapter = CapRoverAdapter(client=client)
+                    await adapter.configure(
+                        config={
+                            "url": FAKE_URL,
+                            "password": fake.password,
+                            "app": fake.app_name(index),
+                        }
+                    )
+                    start = time.perf_counter()
+                    await operation(adapter, index, round)
+                    return time.perf_counter() - start
+
+            for name, operation in operations.items():
+                samples = []
+                wall_time = 0.0
+                fake.calls.clear()
+
+                for round in range(rounds):
+                    start = time.perf_counter()
+                    samples += await asyncio.gather(
+                        *(timed(operation, i, round) for i in range(apps))
+                    )
+                    wall_time += time.perf_counter() - start
+
+                self.stdout.write(
+                    f"{name:<14}{len(samples):>8}"
+                    f"{percentile(samples, 50) * 1000:>10.1f}"
+                    f"{percentile(samples, 95) * 1000:>10.1f}"
+                    f"{max(samples) * 1000:>10.1f}"
+                    f"{len(samples) / wall_time:>10.1f}"
+                    f"{sum(fake.calls.values()):>10}"
+                )
@@ -0,0 +1,122 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.contexts.config_table import get_environments, get_item_values, get_items
+from core.models import (
+    ConfigItem,
+    ConfigItemValue,
+    Environment,
+    Organization,
+    Project,
+    Service,
+)
+
+# Tables that grow with the number of config values
+HOT_TABLES = ("core_configitem", "core_configitemvalue", "core_environment")
+
+
+class Rollback(Exception):
+    pass
+
+
+def full_scans(plan: str) -> list[str]:
+    """
+    Return the lines of `plan` that read a whole hot table.
+    """
+    if connection.vendor == "postgresql":
+        pattern = r"Seq Scan on (\w+)"
+    elif connection.vendor == "sqlite":
+        # "SCAN t USING INDEX i" still reads through the index only
+        pattern = r"SCAN (\w+)(?! USING)(?:\s|$)"
+    else:
+        raise CommandError(f"Unsupported database {connection.vendor!r}")
+
+    return [
+        line
+        for line in plan.splitlines()
+        if (match := re.search(pattern, line)) and match.group(1) in HOT_TABLES
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that the queries of the service config matrix use indexes, on "
+        "generated data that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--values",
+            type=int,
+            default=100_000,
+            help="Total number of config values to generate.",
+        )
+        parser.add_argument(
+            "--items", type=int, default=200, help="Config items per service."
+        )
+        parser.add_argument(
+            "--environments", type=int, default=10, help="Environments per service."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.check_plans(**options)
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def check_plans(self, *, values, items, environments, **options):
+        services = max(1, values // (items * environments))
+        self.stdout.write(
+            f"Generating {services} services x {items} items x "
+            f"{environments} environments"
+        )
+
+        org = Organization.objects.create(name="query plan check")
+        project = Project.objects.create(organization=org, name="query plan check")
+        for index in range(services):
+            service = Service.objects.create(project=project, name=f"service-{index}")
+            envs = Environment.objects.bulk_create(
+                Environment(service=service, name=f"env-{i}")
+                for i in range(environments)
+            )
+            config_items = ConfigItem.objects.bulk_create(
+                ConfigItem(service=service, name=f"ITEM_{i}", type=ConfigItem.Type.ENV)
+                for i in range(items)
+            )
+            ConfigItemValue.objects.bulk_create(
+                (
+                    ConfigItemValue(item=item, environment=env, value="value")
+                    for item in config_items
+                    for env in envs
+                ),
+                batch_size=5000,
+            )
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        # the service in the middle, so neither end of an index is special
+        service = Service.objects.filter(project=project).order_by("id")[services // 2]
+        matrix_items = get_items(org, project, service)
+        queries = {
+            "environments": get_environments(org, project, service),
+            "items": matrix_items,
+            "values": get_item_values(matrix_items),
+        }
+
+        failed = False
+        for name, queryset in queries.items():
+            plan = queryset.explain()
+            scans = full_scans(plan)
+            failed = failed or bool(scans)
+
+            self.stdout.write(f"{name}: {'FULL SCAN' if scans else 'ok'}")
+            if options["verbosity"] > 1 or scans:
+                self.stdout.write(plan)
+
+        if failed:
+            raise CommandError("Some matrix queries read whole tables")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.api_tokens import create_token
+from core.models import Project
+
+
+class Command(BaseCommand):
+    help = "Create a token for the read-only API of a project."
+
+    def add_arguments(self, parser):
+        parser.add_argument("project_id", type=int)
+        parser.add_argument("name", help="What the token is used for.")
+
+    def handle(self, *args, **options):
+        project = Project.objects.filter(id=options["project_id"]).first()
+        if project is None:
+            raise CommandError("No such project")
+
+        api_token, token = create_token(project, options["name"])
+        self.stderr.write(
+            f"Created token {api_token.id} for project {project}. It is only "
+            "shown once:"
+        )
+        self.stdout.write(token)
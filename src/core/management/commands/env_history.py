@@ -0,0 +1,91 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Environment, EnvironmentRevision
+from core.reconcile import reconcile_environment
+from core.revisions import diff, reconstruct, reconstruct_raw
+
+
+class Command(BaseCommand):
+    help = "List, show, compare or roll back revisions of an environment."
+
+    def add_arguments(self, parser):
+        parser.add_argument("environment_id", type=int)
+        parser.add_argument(
+            "--show", type=int, metavar="VERSION", help="Print the values of VERSION."
+        )
+        parser.add_argument(
+            "--diff",
+            type=int,
+            nargs=2,
+            metavar=("FROM", "TO"),
+            help="Print the changes between two versions.",
+        )
+        parser.add_argument(
+            "--rollback",
+            type=int,
+            metavar="VERSION",
+            help="Restore the values of VERSION as a new revision.",
+        )
+
+    def handle(self, *args, **options):
+        environment = Environment.objects.filter(id=options["environment_id"]).first()
+        if environment is None:
+            raise CommandError("No such environment")
+
+        try:
+            if options["show"] is not None:
+                self.show(environment, options["show"])
+            elif options["diff"] is not None:
+                self.diff(environment, *options["diff"])
+            elif options["rollback"] is not None:
+                self.rollback(environment, options["rollback"])
+            else:
+                self.list(environment)
+        except EnvironmentRevision.DoesNotExist as e:
+            raise CommandError(str(e)) from e
+
+    def list(self, environment):
+        revisions = EnvironmentRevision.objects.filter(
+            environment=environment
+        ).order_by("-version")
+        for revision in revisions:
+            if revision.is_checkpoint:
+                changes = f"{len(revision.data)} values"
+            else:
+                changes = (
+                    f"{len(revision.data['set'])} set, "
+                    f"{len(revision.data['unset'])} unset"
+                )
+            self.stdout.write(
+                f"{revision.version:>6}  {revision.created_at:%Y-%m-%d %H:%M:%S}  "
+                f"{changes}"
+            )
+
+    def show(self, environment, version):
+        for name, value in sorted(reconstruct(environment.id, version).items()):
+            self.stdout.write(f"{name}={value}")
+
+    def diff(self, environment, from_version, to_version):
+        delta = diff(environment.id, from_version, to_version)
+        for name, value in sorted(delta.added.items()):
+            self.stdout.write(f"+ {name}={value}")
+        for name, value in sorted(delta.changed.items()):
+            self.stdout.write(f"~ {name}={value}")
+        for name in delta.removed:
+            self.stdout.write(f"- {name}")
+
+    def rollback(self, environment, version):
+        # Restore the values as entered, so placeholders are kept
+        values = reconstruct_raw(environment.id, version)
+        if values is None:
+            self.stderr.write(
+                f"Version {version} predates the recording of values as entered, "
+                "restoring its resolved values"
+            )
+            values = reconstruct(environment.id, version)
+
+        summary = reconcile_environment(environment, values, prune=True)
+        self.stdout.write(
+            f"Restored version {version}: {len(summary.added)} added, "
+            f"{len(summary.changed)} changed, {len(summary.removed)} removed"
+        )
@@ -0,0 +1,216 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import crypto
+from core.models import (
+    ConfigItem,
+    ConfigItemValue,
+    DataKey,
+    Environment,
+    EnvironmentRevision,
+    EnvironmentSnapshot,
+)
+from core.snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrap all data keys with the first of CONFITURE_MASTER_KEYS and "
+        "create a new data key for new secret values."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reseal",
+            action="store_true",
+            help=(
+                "Also re-encrypt all secret values with the new data key, "
+                "encrypt values of secret items stored in plain text and "
+                "decrypt values of items that are no longer secret. Snapshots "
+                "and revisions are re-encrypted as well."
+            ),
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        crypto.clear_caches()
+
+        try:
+            rewrapped = self.rewrap()
+        except crypto.DecryptionError as e:
+            raise CommandError(str(e)) from e
+
+        data_key = crypto.create_data_key()
+        self.stdout.write(
+            f"Rewrapped {rewrapped} data keys, new values are sealed with data "
+            f"key {data_key.id}"
+        )
+
+        if options["reseal"]:
+            resealed = self.reseal(options["batch_size"])
+            self.stdout.write(f"Resealed {resealed} values")
+
+            # bulk_update() sends no signals, and snapshots and revisions
+            # keep copies of the values.
+            self.reseal_snapshots(options["batch_size"])
+            resealed = self.reseal_revisions(options["batch_size"])
+            self.stdout.write(f"Resealed {resealed} revisions")
+
+            plaintext = find_plaintext_secrets()
+            if plaintext:
+                raise CommandError(
+                    f"{len(plaintext)} snapshots or revisions still contain "
+                    "unencrypted secrets"
+                )
+
+        # Forget the data keys unwrapped with the previous master keys
+        crypto.clear_caches()
+
+    def rewrap(self):
+        master_key_id, _ = crypto.get_current_master_key()
+        rewrapped = 0
+        with transaction.atomic():
+            for data_key in DataKey.objects.select_for_update().exclude(
+                master_key_id=master_key_id
+            ):
+                key = crypto.unwrap_data_key(data_key)
+                data_key.master_key_id, data_key.wrapped_key = crypto.wrap_data_key(key)
+                data_key.save(update_fields=["master_key_id", "wrapped_key"])
+                rewrapped += 1
+
+        return rewrapped
+
+    def reseal(self, batch_size):
+        resealed = 0
+        last_id = 0
+        while True:
+            # Lock each batch, so edits made meanwhile are not overwritten
+            with transaction.atomic():
+                batch = list(
+                    ConfigItemValue.objects.select_for_update(of=("self",))
+                    .filter(id__gt=last_id)
+                    .order_by("id")
+                    .values_list("id", "value", "item__is_secret")[:batch_size]
+                )
+                if not batch:
+                    return resealed
+
+                last_id = batch[-1][0]
+
+                secret = [(id, value) for id, value, is_secret in batch if is_secret]
+                sealed = crypto.seal_many([crypto.unseal(value) for _, value in secret])
+                updates = [
+                    ConfigItemValue(id=id, value=value)
+                    for (id, _), value in zip(secret, sealed)
+                ]
+                updates += [
+                    ConfigItemValue(id=id, value=crypto.escape(crypto.unseal(value)))
+                    for id, value, is_secret in batch
+                    if not is_secret and crypto.is_sealed(value)
+                ]
+
+                ConfigItemValue.objects.bulk_update(updates, ["value"])
+                resealed += len(updates)
+
+    def reseal_snapshots(self, batch_size):
+        environment_ids = list(
+            Environment.objects.order_by("id").values_list("id", flat=True)
+        )
+        for start in range(0, len(environment_ids), batch_size):
+            rebuild_snapshots(environment_ids[start : start + batch_size])
+
+    def reseal_revisions(self, batch_size):
+        secret_names = get_secret_names()
+        resealed = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    EnvironmentRevision.objects.select_for_update()
+                    .filter(id__gt=last_id)
+                    .order_by("id")[:batch_size]
+                )
+                if not batch:
+                    return resealed
+
+                last_id = batch[-1].id
+
+                data_key_id = crypto.get_active_data_key_id()
+                for revision in batch:
+                    names = secret_names.get(revision.environment_id, set())
+                    for field in ["data", "raw_data"]:
+                        values = get_revision_values(revision, field)
+                        values.update(
+                            {
+                                name: crypto.seal(crypto.unseal(value), data_key_id)
+                                for name, value in values.items()
+                                if name in names or crypto.is_sealed(value)
+                            }
+                        )
+
+                EnvironmentRevision.objects.bulk_update(batch, ["data", "raw_data"])
+                resealed += len(batch)
+
+
+def get_revision_values(
+    revision: EnvironmentRevision, field: str = "data"
+) -> dict[str, str]:
+    data = getattr(revision, field)
+    if data is None:
+        return {}
+
+    # Checkpoints store all values, other revisions only the changed ones
+    return data if revision.is_checkpoint else data["set"]
+
+
+def get_secret_names() -> dict[int, set[str]]:
+    """
+    Return the names of the values that must be encrypted, by environment:
+    those of secret items, and those derived from secrets.
+    """
+    secret_names = defaultdict(set)
+    for environment_id, name in ConfigItem.objects.filter(
+        is_secret=True, service__environment__isnull=False
+    ).values_list("service__environment", "name"):
+        secret_names[environment_id].add(name)
+
+    for environment_id, data in EnvironmentSnapshot.objects.values_list(
+        "environment_id", "data"
+    ):
+        secret_names[environment_id].update(
+            name for name, value in data.items() if crypto.is_sealed(value)
+        )
+
+    return secret_names
+
+
+def find_plaintext_secrets() -> list[tuple[str, int]]:
+    """
+    Return the snapshots and revisions, as (model name, id), that contain
+    secret values in plain text.
+    """
+    secret_names = get_secret_names()
+
+    def has_plaintext(environment_id, values):
+        names = secret_names.get(environment_id, set())
+        return any(
+            name in names and not crypto.is_sealed(value)
+            for name, value in values.items()
+        )
+
+    found = [
+        ("snapshot", snapshot.environment_id)
+        for snapshot in EnvironmentSnapshot.objects.iterator()
+        if has_plaintext(snapshot.environment_id, snapshot.data)
+    ]
+    found += [
+        ("revision", revision.id)
+        for revision in EnvironmentRevision.objects.iterator()
+        if has_plaintext(revision.environment_id, get_revision_values(revision))
+        or has_plaintext(
+            revision.environment_id, get_revision_values(revision, "raw_data")
+        )
+    ]
+    return found
@@ -1,18 +1,127 @@
 import asyncio
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from core.adapters.caprover import CapRoverAdapter
+from core.adapters.metrics import metrics
+from core.adapters.registry import get_adapter_paths
+from core.adapters.runner import DEFAULT_CONCURRENCY, pull_all, push_all
 from core.models import AdapterConfig
 
 
-async def cmd(config):
-    adapter = CapRoverAdapter()
-    await adapter.configure(config=config)
-    await adapter.push(items=[])
+def get_adapter_names(cls: str) -> set[str]:
+    """
+    Return every way an adapter config can name the adapter `cls`: its
+    dotted path and its registered names.
+    """
+    paths = get_adapter_paths()
+    path = paths.get(cls, cls)
+    return {path, *(name for name, other in paths.items() if other == path)}
 
 
 class Command(BaseCommand):
+    help = (
+        "Push configuration to (or pull it from) the targets of one or more "
+        "adapter configs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "ids",
+            nargs="*",
+            type=int,
+            help=(
+                "Ids of the adapter configs to push (default: the first one, or "
+                "all of --cls)."
+            ),
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Push every adapter config.",
+        )
+        parser.add_argument(
+            "--cls",
+            help=(
+                "Only push adapter configs with this adapter, given by name or "
+                "dotted class path."
+            ),
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Push even if the values did not change since the last push.",
+        )
+        parser.add_argument(
+            "--pull",
+            action="store_true",
+            help="Import the values on the targets instead of pushing.",
+        )
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="When pulling, delete values that are missing on the target.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=DEFAULT_CONCURRENCY,
+            help="Maximum number of concurrent pushes.",
+        )
+
     def handle(self, *args, **options):
-        ac = AdapterConfig.objects.first()
-        asyncio.run(cmd(config=ac.config))
+        ids = options["ids"]
+        cls = options["cls"]
+        concurrency = options["concurrency"]
+        if concurrency < 1:
+            raise CommandError("--concurrency must be at least 1")
+
+        adapter_configs = AdapterConfig.objects.order_by("id")
+        if cls:
+            adapter_configs = adapter_configs.filter(cls__in=get_adapter_names(cls))
+        if ids:
+            adapter_configs = adapter_configs.filter(id__in=ids)
+        elif not options["all"] and not cls:
+            adapter_configs = adapter_configs[:1]
+
+        adapter_configs = list(adapter_configs)
+        if not adapter_configs:
+            raise CommandError("No matching adapter configs")
+
+        if options["pull"]:
+            run = pull_all(
+                adapter_configs,
+                concurrency=concurrency,
+                prune=options["prune"],
+            )
+        else:
+            run = push_all(
+                adapter_configs,
+                concurrency=concurrency,
+                force=options["force"],
+            )
+
+        results = asyncio.run(run)
+        metrics.flush()
+
+        failed = 0
+        for result in results:
+            ac = result.adapter_config
+            if result.skipped:
+                self.stdout.write(f"{ac.id} {ac.cls}: unchanged")
+            elif result.summary is not None:
+                summary = result.summary
+                self.stdout.write(
+                    f"{ac.id} {ac.cls}: {len(summary.added)} added, "
+                    f"{len(summary.changed)} changed, {len(summary.removed)} removed"
+                )
+            elif result.ok:
+                self.stdout.write(f"{ac.id} {ac.cls}: ok")
+            else:
+                failed += 1
+                self.stderr.write(f"{ac.id} {ac.cls}: {result.error!r}")
+
+            for warning in result.warnings:
+                self.stdout.write(f"{ac.id} {ac.cls}: {warning.code} {warning.message}")
+
+        if failed:
+            raise CommandError(f"{failed} of {len(results)} adapter runs failed")
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import socket
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from core.adapters.metrics import metrics
+from core.adapters.runner import DEFAULT_CONCURRENCY, make_client, push_one
+from core.jobs import claim_jobs, complete_job, fail_job, requeue_stale_jobs
+
+# Seconds between checks for jobs left behind by dead workers
+REQUEUE_INTERVAL = 60
+
+# Seconds between writes of the collected adapter metrics to the database
+METRICS_FLUSH_INTERVAL = 30
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued adapter syncs. Start more worker processes to sync more "
+        "targets in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=DEFAULT_CONCURRENCY,
+            help="Maximum number of concurrent syncs in this worker.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait between looking for new jobs.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit as soon as there are no due jobs left.",
+        )
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1")
+
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(f"Worker {worker_id} started")
+
+        try:
+            asyncio.run(
+                self.work(
+                    worker_id,
+                    concurrency=options["concurrency"],
+                    poll_interval=options["poll_interval"],
+                    once=options["once"],
+                )
+            )
+        except KeyboardInterrupt:
+            pass
+        finally:
+            metrics.flush()
+
+    async def work(self, worker_id, *, concurrency, poll_interval, once):
+        loop = asyncio.get_running_loop()
+        tasks = set()
+        next_requeue = loop.time()
+        next_flush = loop.time() + METRICS_FLUSH_INTERVAL
+
+        async with make_client(concurrency) as client:
+            while True:
+                # There are no requests to recycle persistent connections
+                # (CONN_MAX_AGE), so drop expired or broken ones here.
+                await sync_to_async(close_old_connections)()
+
+                if loop.time() >= next_requeue:
+                    await sync_to_async(requeue_stale_jobs)()
+                    next_requeue = loop.time() + REQUEUE_INTERVAL
+
+                if loop.time() >= next_flush:
+                    await sync_to_async(metrics.flush)()
+                    next_flush = loop.time() + METRICS_FLUSH_INTERVAL
+
+                jobs = []
+                if len(tasks) < concurrency:
+                    jobs = await sync_to_async(claim_jobs)(
+                        worker_id, concurrency - len(tasks)
+                    )
+
+                for job in jobs:
+                    tasks.add(asyncio.create_task(self.run_job(job, client)))
+
+                if once and not jobs and not tasks:
+                    return
+
+                if tasks:
+                    _, tasks = await asyncio.wait(
+                        tasks,
+                        timeout=poll_interval,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                elif not jobs:
+                    await asyncio.sleep(poll_interval)
+
+    async def run_job(self, job, client):
+        adapter_config = job.adapter_config
+        try:
+            result = await push_one(adapter_config, client=client)
+        except Exception as e:
+            self.stderr.write(f"{adapter_config.id} {adapter_config.cls}: {e!r}")
+            await sync_to_async(fail_job)(job, repr(e))
+            return
+
+        status = "unchanged" if result.skipped else "ok"
+        self.stdout.write(f"{adapter_config.id} {adapter_config.cls}: {status}")
+        await sync_to_async(complete_job)(job)
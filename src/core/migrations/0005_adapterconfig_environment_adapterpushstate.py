@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_rename_conifg_adapterconfig_config'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adapterconfig',
+            name='environment',
+            field=models.ForeignKey(blank=True, help_text='Environment whose values are synced with the target', null=True, on_delete=django.db.models.deletion.CASCADE, to='core.environment'),
+        ),
+        migrations.CreateModel(
+            name='AdapterPushState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('pushed_at', models.DateTimeField(auto_now=True)),
+                ('adapter_config', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.adapterconfig')),
+                ('environment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.environment')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('adapter_config', 'environment'), name='unique_push_state_per_environment')],
+            },
+        ),
+    ]
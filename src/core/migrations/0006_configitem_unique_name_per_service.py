@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:07
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_items(apps, schema_editor):
+    # Keep the oldest item of each name, moving over the values of the
+    # duplicates for environments it has no value in.
+    ConfigItem = apps.get_model('core', 'ConfigItem')
+    ConfigItemValue = apps.get_model('core', 'ConfigItemValue')
+
+    duplicates = (
+        ConfigItem.objects.values('service_id', 'name')
+        .annotate(count=Count('id'), keep_id=Min('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        others = ConfigItem.objects.filter(
+            service_id=duplicate['service_id'], name=duplicate['name']
+        ).exclude(id=duplicate['keep_id'])
+
+        taken = set(
+            ConfigItemValue.objects.filter(item_id=duplicate['keep_id']).values_list(
+                'environment_id', flat=True
+            )
+        )
+        for value in ConfigItemValue.objects.filter(item__in=others).order_by('id'):
+            if value.environment_id not in taken:
+                value.item_id = duplicate['keep_id']
+                value.save(update_fields=['item'])
+                taken.add(value.environment_id)
+
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_adapterconfig_environment_adapterpushstate'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='configitem',
+            constraint=models.UniqueConstraint(fields=('service', 'name'), name='unique_name_per_service'),
+        ),
+    ]
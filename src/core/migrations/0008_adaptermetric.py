@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_syncjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdapterMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hook', models.CharField(max_length=50)),
+                ('calls', models.PositiveBigIntegerField(default=0)),
+                ('errors', models.PositiveBigIntegerField(default=0)),
+                ('http_calls', models.PositiveBigIntegerField(default=0)),
+                ('total_seconds', models.FloatField(default=0)),
+                ('max_seconds', models.FloatField(default=0)),
+                ('buckets', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('adapter_config', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.adapterconfig')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('adapter_config', 'hook'), name='unique_metric_per_hook')],
+            },
+        ),
+    ]
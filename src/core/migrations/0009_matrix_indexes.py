@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_adaptermetric'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='configitemvalue',
+            index=models.Index(fields=['environment', 'item'], name='value_environment_item_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='environment',
+            index=models.Index(fields=['service', 'name'], name='environment_service_name_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_matrix_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnvironmentSnapshot',
+            fields=[
+                ('environment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.environment')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('data', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
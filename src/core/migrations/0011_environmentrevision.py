@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def checkpoint_snapshots(apps, schema_editor):
+    EnvironmentSnapshot = apps.get_model('core', 'EnvironmentSnapshot')
+    EnvironmentRevision = apps.get_model('core', 'EnvironmentRevision')
+
+    EnvironmentRevision.objects.bulk_create(
+        EnvironmentRevision(
+            environment_id=snapshot.environment_id,
+            version=snapshot.version,
+            is_checkpoint=True,
+            content_hash=snapshot.content_hash,
+            data=snapshot.data,
+        )
+        for snapshot in EnvironmentSnapshot.objects.filter(version__gt=0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_environmentsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnvironmentRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField()),
+                ('is_checkpoint', models.BooleanField(default=False)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('data', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('environment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.environment')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('environment', 'version'), name='unique_revision_per_environment')],
+            },
+        ),
+        migrations.RunPython(checkpoint_snapshots, migrations.RunPython.noop),
+    ]
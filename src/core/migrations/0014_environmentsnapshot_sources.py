@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_apitoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='environmentsnapshot',
+            name='dependencies',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='environmentsnapshot',
+            name='errors',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='environmentsnapshot',
+            name='sources',
+            field=models.JSONField(default=dict),
+        ),
+    ]
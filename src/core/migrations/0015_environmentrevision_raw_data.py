@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_environmentsnapshot_sources'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='environmentrevision',
+            name='raw_data',
+            field=models.JSONField(null=True),
+        ),
+    ]
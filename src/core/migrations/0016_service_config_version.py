@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_environmentrevision_raw_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='config_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
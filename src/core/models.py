@@ -1,10 +1,120 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+from core import crypto
 
 
 class AdapterConfig(models.Model):
     cls = models.CharField(max_length=255, help_text="Dotted path of adapter class")
     config = models.JSONField()
+    environment = models.ForeignKey(
+        "Environment",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        help_text="Environment whose values are synced with the target",
+    )
+
+
+class AdapterPushState(models.Model):
+    """
+    What was last pushed successfully for an adapter config and environment.
+    """
+
+    adapter_config = models.ForeignKey(AdapterConfig, on_delete=models.CASCADE)
+    environment = models.ForeignKey("Environment", on_delete=models.CASCADE)
+
+    content_hash = models.CharField(max_length=64)
+    pushed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["adapter_config", "environment"],
+                name="unique_push_state_per_environment",
+            ),
+        ]
+
+
+class AdapterMetric(models.Model):
+    """
+    Accumulated timings of one hook (configure, pull, push) of an adapter config.
+
+    `buckets` counts calls per duration bucket, see core.adapters.metrics.
+    """
+
+    adapter_config = models.ForeignKey(AdapterConfig, on_delete=models.CASCADE)
+    hook = models.CharField(max_length=50)
+
+    calls = models.PositiveBigIntegerField(default=0)
+    errors = models.PositiveBigIntegerField(default=0)
+    http_calls = models.PositiveBigIntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+    max_seconds = models.FloatField(default=0)
+    buckets = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["adapter_config", "hook"],
+                name="unique_metric_per_hook",
+            ),
+        ]
+
+
+class SyncJobStatus(models.TextChoices):
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+
+
+class SyncJob(models.Model):
+    """
+    A pending or running push of an adapter config's environment.
+
+    Finished jobs are deleted; jobs that failed too often are kept as FAILED.
+    """
+
+    Status = SyncJobStatus
+
+    adapter_config = models.ForeignKey(AdapterConfig, on_delete=models.CASCADE)
+    environment = models.ForeignKey("Environment", on_delete=models.CASCADE)
+
+    status = models.CharField(
+        max_length=16, choices=SyncJobStatus, default=SyncJobStatus.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["adapter_config", "environment"],
+                condition=models.Q(status=SyncJobStatus.PENDING),
+                name="unique_pending_sync_job",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="sync_job_due_idx"),
+        ]
+
+
+class DataKey(models.Model):
+    """
+    A key that encrypts the values of secret items, stored encrypted with the
+    master key `master_key_id` (see CONFITURE_MASTER_KEYS). The newest data
+    key seals new values; old ones are kept to read existing values.
+    """
+
+    master_key_id = models.CharField(max_length=16)
+    wrapped_key = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
 
 
 class Organization(models.Model):
@@ -32,6 +142,9 @@ class Service(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
 
     name = models.CharField(max_length=50)
+    # Increases whenever the service's config table changes. Rendered tables
+    # are cached under it, so all processes agree on when they are stale.
+    config_version = models.PositiveBigIntegerField(default=0)
 
     def __str__(self):
         return self.name
@@ -42,10 +155,77 @@ class Environment(models.Model):
 
     name = models.CharField(max_length=50)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["service", "name"], name="environment_service_name_idx"
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class EnvironmentSnapshot(models.Model):
+    """
+    The values of an environment (item name to value), kept up to date when
+    they change. `version` increases with every change of the content.
+
+    Values that can't be resolved keep their last value and are listed in
+    `errors`, and the environment is not pushed until they are fixed.
+    """
+
+    environment = models.OneToOneField(
+        Environment, on_delete=models.CASCADE, primary_key=True
+    )
+
+    version = models.PositiveBigIntegerField(default=0)
+    content_hash = models.CharField(max_length=64)
+    data = models.JSONField(default=dict)
+    # What `data` was resolved from, to only resolve changed values again:
+    # [is reference, stored value] and the nodes each value depends on, by name
+    sources = models.JSONField(default=dict)
+    dependencies = models.JSONField(default=dict)
+    # Error message by name
+    errors = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def get_values(self) -> dict[str, str]:
+        """
+        Return `data` with secret values decrypted.
+        """
+        return crypto.unseal_values(self.data)
+
+
+class EnvironmentRevision(models.Model):
+    """
+    A version of an environment's snapshot.
+
+    Checkpoints store all values in `data`, other revisions only the changes
+    to the previous version as {"set": {name: value}, "unset": [name]}.
+    `raw_data` stores the values of the items other than references before
+    they were resolved the same way, or is None for revisions from before it
+    was recorded.
+    """
+
+    environment = models.ForeignKey(Environment, on_delete=models.CASCADE)
+    version = models.PositiveBigIntegerField()
+
+    is_checkpoint = models.BooleanField(default=False)
+    content_hash = models.CharField(max_length=64)
+    data = models.JSONField()
+    raw_data = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["environment", "version"],
+                name="unique_revision_per_environment",
+            ),
+        ]
+
+
 class ConfigItemType(models.IntegerChoices):
     ENV = 1
     FILE = 2
@@ -60,14 +240,32 @@ class ConfigItem(models.Model):
     type = models.PositiveSmallIntegerField(choices=ConfigItemType)
     is_secret = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["service", "name"],
+                name="unique_name_per_service",
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Changing is_secret encrypts or decrypts the item's values
+        instance._loaded_is_secret = instance.__dict__.get("is_secret")
+        return instance
+
 
 class ConfigItemValue(models.Model):
     item = models.ForeignKey(ConfigItem, on_delete=models.CASCADE)
     environment = models.ForeignKey(Environment, on_delete=models.CASCADE)
 
+    # Encrypted (see core.crypto) if the item is secret. Instances hold the
+    # decrypted value; querysets with values()/values_list() return it as
+    # stored.
     value = models.TextField()
 
     class Meta:
@@ -77,6 +275,58 @@ class ConfigItemValue(models.Model):
                 name="unique_item_per_environment",
             ),
         ]
+        indexes = [
+            # Values of one environment; (item, environment) is covered by
+            # unique_item_per_environment.
+            models.Index(
+                fields=["environment", "item"], name="value_environment_item_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.value
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._sealed_value = None
+        if "value" in instance.__dict__:
+            if crypto.is_sealed(instance.value):
+                instance._sealed_value = instance.value
+            instance.value = crypto.unseal(instance.value)
+
+        return instance
+
+    def save(self, *args, **kwargs):
+        plaintext = self.value
+        if self.item.is_secret:
+            sealed_value = getattr(self, "_sealed_value", None)
+            # Keep the ciphertext of unchanged values, it is still valid.
+            if sealed_value is None or crypto.unseal(sealed_value) != plaintext:
+                sealed_value = crypto.seal(plaintext)
+
+            self.value = sealed_value
+            self._sealed_value = sealed_value
+        else:
+            self.value = crypto.escape(plaintext)
+
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            self.value = plaintext
+
+
+class ApiToken(models.Model):
+    """
+    A token for the read-only API, giving access to the environments of a
+    project. Only the SHA-256 digest of the token is stored.
+    """
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+
+    name = models.CharField(max_length=50)
+    digest = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
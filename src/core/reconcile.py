@@ -0,0 +1,122 @@
+from attrs import define, field
+from django.db import transaction
+
+from core.adapters.spec import compute_delta
+from core.crypto import escape, seal_many, unseal_values
+from core.models import ConfigItem, ConfigItemValue, Environment
+from core.signals import record_changes
+from core.snapshots import get_snapshot
+
+
+@define
+class ReconcileSummary:
+    added: list[str] = field(factory=list)
+    changed: list[str] = field(factory=list)
+    removed: list[str] = field(factory=list)
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+
+def reconcile_environment(
+    environment: Environment,
+    values: dict[str, str],
+    *,
+    prune: bool = False,
+) -> ReconcileSummary:
+    """
+    Make the values of `environment` match `values` (item name to value).
+
+    Items missing in the environment's service are created as ENV items.
+    Values of items not in `values` are only deleted if `prune` is set. REF
+    items are resolved from other values and left alone, and so are values
+    given as they are resolved, so pulling keeps placeholders.
+
+    Runs a constant number of queries, no matter how many values change.
+    """
+    with transaction.atomic():
+        reference_names = set(
+            ConfigItem.objects.filter(
+                service_id=environment.service_id, type=ConfigItem.Type.REF
+            ).values_list("name", flat=True)
+        )
+        values = {
+            name: value for name, value in values.items() if name not in reference_names
+        }
+        current = unseal_values(
+            dict(
+                ConfigItemValue.objects.filter(environment=environment)
+                .exclude(item__type=ConfigItem.Type.REF)
+                .values_list("item__name", "value")
+            )
+        )
+        delta = compute_delta(current, values)
+        if delta.changed:
+            resolved = get_snapshot(environment.id).get_values()
+            delta.changed = {
+                name: value
+                for name, value in delta.changed.items()
+                if value != resolved.get(name)
+            }
+        upserts = {**delta.added, **delta.changed}
+
+        if delta.added:
+            ConfigItem.objects.bulk_create(
+                [
+                    ConfigItem(
+                        service_id=environment.service_id,
+                        name=name,
+                        type=ConfigItem.Type.ENV,
+                    )
+                    for name in delta.added
+                ],
+                ignore_conflicts=True,
+            )
+
+        if upserts:
+            items = {
+                name: (item_id, is_secret)
+                for name, item_id, is_secret in ConfigItem.objects.filter(
+                    service_id=environment.service_id,
+                    name__in=upserts,
+                ).values_list("name", "id", "is_secret")
+            }
+            secret_names = [name for name in upserts if items[name][1]]
+            sealed = dict(
+                zip(
+                    secret_names,
+                    seal_many([upserts[name] for name in secret_names]),
+                )
+            )
+            ConfigItemValue.objects.bulk_create(
+                [
+                    ConfigItemValue(
+                        item_id=items[name][0],
+                        environment=environment,
+                        value=sealed.get(name) or escape(value),
+                    )
+                    for name, value in upserts.items()
+                ],
+                update_conflicts=True,
+                unique_fields=["item", "environment"],
+                update_fields=["value"],
+            )
+
+        if prune and delta.removed:
+            ConfigItemValue.objects.filter(
+                environment=environment,
+                item__name__in=delta.removed,
+            ).delete()
+
+        # bulk_create() sends no signals
+        if upserts or (prune and delta.removed):
+            record_changes(
+                environment_ids=[environment.id],
+                table_service_ids=[environment.service_id],
+            )
+
+    return ReconcileSummary(
+        added=sorted(delta.added),
+        changed=sorted(delta.changed),
+        removed=delta.removed if prune else [],
+    )
@@ -0,0 +1,376 @@
+from collections import defaultdict, deque
+from typing import Iterable
+
+from attrs import define, field
+
+from core.crypto import escape, get_active_data_key_id, is_sealed, seal, unseal
+from core.interpolation import Template, compile_template
+from core.models import (
+    ConfigItemType,
+    ConfigItemValue,
+    Environment,
+    EnvironmentSnapshot,
+)
+
+# An item of an environment: (environment id, item name)
+Node = tuple[int, str]
+
+
+class ResolveError(Exception):
+    pass
+
+
+class ReferenceCycleError(ResolveError):
+    pass
+
+
+def parse_reference(
+    reference: str,
+    environment_id: int,
+    service_name: str,
+    environment_ids: dict[tuple[str, str], int],
+) -> Node | None:
+    """
+    Return the node a REF value points to, or None if there is no such
+    environment.
+
+    References are "NAME" (same environment), "ENV/NAME" (same service) or
+    "SERVICE/ENV/NAME" (same project).
+    """
+    *path, name = reference.strip().split("/")
+    if len(path) == 0:
+        return environment_id, name
+    elif len(path) == 1:
+        target_id = environment_ids.get((service_name, path[0]))
+    elif len(path) == 2:
+        target_id = environment_ids.get((path[0], path[1]))
+    else:
+        return None
+
+    return (target_id, name) if target_id is not None else None
+
+
+def closure[T](start: Iterable[T], edges: dict[T, set[T]]) -> set[T]:
+    seen = set(start)
+    queue = deque(seen)
+    while queue:
+        for next_id in edges.get(queue.popleft(), ()):
+            if next_id not in seen:
+                seen.add(next_id)
+                queue.append(next_id)
+
+    return seen
+
+
+@define
+class Resolver:
+    """
+    Values of environments with REF items and ${NAME} placeholders resolved.
+
+    A node depends on the target of its reference, or on the items of its
+    environment named by its placeholders. Nodes are evaluated after their
+    dependencies and memoized, so each is evaluated once per resolver.
+
+    Snapshots record the stored values and the dependencies they were
+    resolved from. `reuse()` takes the values of the nodes that didn't change
+    since from the snapshots, so only the nodes downstream of a change are
+    parsed and evaluated again.
+
+    A value is encrypted if it is or depends on an encrypted one.
+    """
+
+    environment_ids: set[int]
+    # Environments whose values are needed to resolve those of environment_ids
+    value_environment_ids: set[int]
+    service_names: dict[int, str]
+    environment_ids_by_name: dict[tuple[str, str], int]
+    refs: dict[Node, Node | None]
+    # Item name to raw value by environment
+    values: dict[int, dict[str, str]] = field(factory=dict)
+    resolved: dict[Node, str] = field(factory=dict)
+    errors: dict[Node, ResolveError] = field(factory=dict)
+    templates: dict[Node, Template] = field(factory=dict)
+    links: dict[Node, list[Node]] = field(factory=dict)
+    data_key_id: int | None = None
+
+    @classmethod
+    def load(cls, environment_ids: Iterable[int]) -> "Resolver":
+        """
+        Load the references of the given environments and of the
+        environments referencing them, in two queries. Call `load_values()`
+        before resolving.
+        """
+        environment_ids = set(environment_ids)
+        environments = Environment.objects.filter(
+            service__project__in=Environment.objects.filter(
+                id__in=environment_ids
+            ).values("service__project")
+        ).values_list("id", "name", "service__name")
+
+        service_names = {}
+        ids_by_name = {}
+        for environment_id, name, service_name in environments:
+            service_names[environment_id] = service_name
+            ids_by_name[service_name, name] = environment_id
+
+        refs = {}
+        for environment_id, name, reference in ConfigItemValue.objects.filter(
+            environment_id__in=service_names, item__type=ConfigItemType.REF
+        ).values_list("environment_id", "item__name", "value"):
+            refs[environment_id, name] = parse_reference(
+                unseal(reference),
+                environment_id,
+                service_names[environment_id],
+                ids_by_name,
+            )
+
+        referenced_environments = defaultdict(set)
+        referencing_environments = defaultdict(set)
+        for node, target in refs.items():
+            if target is not None:
+                referenced_environments[node[0]].add(target[0])
+                referencing_environments[target[0]].add(node[0])
+
+        environment_ids = closure(
+            environment_ids & service_names.keys(), referencing_environments
+        )
+
+        return cls(
+            environment_ids=environment_ids,
+            value_environment_ids=closure(environment_ids, referenced_environments),
+            service_names=service_names,
+            environment_ids_by_name=ids_by_name,
+            refs=refs,
+        )
+
+    def load_values(self) -> "Resolver":
+        values = defaultdict(dict)
+        for environment_id, name, value in ConfigItemValue.objects.filter(
+            environment_id__in=self.value_environment_ids
+        ).values_list("environment_id", "item__name", "value"):
+            values[environment_id][name] = value
+
+        self.values = dict(values)
+        self.resolved.clear()
+        self.errors.clear()
+        self.templates.clear()
+        self.links.clear()
+        return self
+
+    def reuse(self, snapshots: Iterable[EnvironmentSnapshot]):
+        """
+        Take the values of the given snapshots for the nodes whose stored
+        value is the same as when the snapshot was built, and whose
+        dependencies are too. Call after `load_values()`.
+        """
+        snapshots = {snapshot.environment_id: snapshot for snapshot in snapshots}
+        changed = set()
+        for environment_id, snapshot in snapshots.items():
+            names = self.values.get(environment_id, {}).keys() | snapshot.sources.keys()
+            for name in names:
+                node = environment_id, name
+                links = [tuple(link) for link in snapshot.dependencies.get(name, [])]
+                if (
+                    snapshot.sources.get(name) != self.get_source(node)
+                    or name in snapshot.errors
+                    or name not in snapshot.data
+                    or (node in self.refs and links != self.get_links(node))
+                ):
+                    changed.add(node)
+                else:
+                    # Unchanged templates need not be parsed again
+                    self.links[node] = links
+
+        dependents = defaultdict(set)
+        for environment_id in snapshots:
+            for name in self.values.get(environment_id, {}):
+                node = environment_id, name
+                for link in self.get_links(node):
+                    if link[0] in snapshots:
+                        dependents[link].add(node)
+                    else:
+                        # Values of environments without a snapshot are
+                        # evaluated again
+                        changed.add(node)
+
+        stale = closure(changed, dependents)
+        for environment_id, snapshot in snapshots.items():
+            for name in self.values.get(environment_id, {}):
+                if (environment_id, name) not in stale:
+                    self.resolved[environment_id, name] = snapshot.data[name]
+
+    def get_template(self, node: Node) -> Template | None:
+        if node not in self.templates:
+            environment_id, name = node
+            value = self.values.get(environment_id, {}).get(name)
+            if value is None:
+                return None
+            self.templates[node] = compile_template(unseal(value))
+
+        return self.templates[node]
+
+    def get_source(self, node: Node) -> list | None:
+        """
+        Return what the value of `node` is computed from, as recorded in
+        snapshots: whether it is a reference, and its stored value.
+        """
+        environment_id, name = node
+        value = self.values.get(environment_id, {}).get(name)
+        if value is None:
+            return None
+
+        return [node in self.refs, value]
+
+    def get_links(self, node: Node) -> list[Node]:
+        """
+        Return the nodes whose change can change the value of `node`: the
+        target of its reference, or the names of its placeholders, defined or
+        not.
+        """
+        if node not in self.links:
+            if node in self.refs:
+                target = self.refs[node]
+                links = [target] if target is not None else []
+            elif (template := self.get_template(node)) is not None:
+                links = [(node[0], name) for name in sorted(template.names)]
+            else:
+                links = []
+            self.links[node] = links
+
+        return self.links[node]
+
+    def get_dependencies(self, node: Node) -> list[Node]:
+        environment_id, name = node
+        if node in self.refs:
+            target = self.refs[node]
+            if target is None:
+                raise ResolveError(f"Invalid reference {name}@{environment_id}")
+            if target == node:
+                raise ResolveError(f"{name}@{environment_id} refers to itself")
+            return [target]
+
+        environment_values = self.values.get(environment_id, {})
+        if name not in environment_values:
+            raise ResolveError(f"Reference to missing value {name}@{environment_id}")
+
+        links = self.get_links(node)
+        if node in links:
+            raise ResolveError(f"{name}@{environment_id} contains itself")
+
+        # Placeholders of undefined names are kept as written
+        return [link for link in links if link[1] in environment_values]
+
+    def evaluate(self, node: Node) -> str:
+        """
+        Compute the value of `node` from its resolved dependencies.
+        """
+        if node in self.refs:
+            return self.resolved[self.refs[node]]
+
+        environment_id, name = node
+        value = self.values[environment_id][name]
+        template = self.get_template(node)
+        if not template.names and not template.has_escapes:
+            return value
+
+        dependencies = {
+            dependency_name: self.resolved[environment_id, dependency_name]
+            for _, dependency_name in self.get_dependencies(node)
+        }
+        rendered = template.render(
+            {
+                dependency_name: unseal(dependency_value)
+                for dependency_name, dependency_value in dependencies.items()
+            }
+        )
+        if is_sealed(value) or any(map(is_sealed, dependencies.values())):
+            if self.data_key_id is None:
+                self.data_key_id = get_active_data_key_id()
+            return seal(rendered, self.data_key_id)
+
+        return escape(rendered)
+
+    def resolve(self, node: Node) -> str:
+        """
+        Return the value of `node`, following references and filling in
+        placeholders.
+
+        Raises ResolveError if a reference points nowhere or if there is a
+        cycle.
+        """
+        if node in self.resolved:
+            return self.resolved[node]
+        if node in self.errors:
+            raise self.errors[node]
+
+        # Depth first, evaluating each node once all of its dependencies are
+        stack = []
+        on_stack = set()
+        try:
+            on_stack.add(node)
+            stack.append((node, iter(self.get_dependencies(node))))
+            while stack:
+                current, dependencies = stack[-1]
+                for dependency in dependencies:
+                    if dependency in self.resolved:
+                        continue
+                    if dependency in self.errors:
+                        raise self.errors[dependency]
+                    if dependency in on_stack:
+                        cycle = [n for n, _ in stack] + [dependency]
+                        raise ReferenceCycleError(
+                            " -> ".join(f"{name}@{env}" for env, name in cycle)
+                        )
+
+                    on_stack.add(dependency)
+                    stack.append((dependency, iter(self.get_dependencies(dependency))))
+                    break
+                else:
+                    stack.pop()
+                    on_stack.discard(current)
+                    self.resolved[current] = self.evaluate(current)
+        except ResolveError as e:
+            # The failed node and everything on the stack depending on it
+            self.errors.update(dict.fromkeys(on_stack, e))
+            raise
+
+        return self.resolved[node]
+
+    def get_values(self, environment_id: int) -> dict[str, str]:
+        """
+        Return the resolved values of an environment. Values that can't be
+        resolved are left out (see `errors`).
+        """
+        values = {}
+        for name in self.values.get(environment_id, {}):
+            try:
+                values[name] = self.resolve((environment_id, name))
+            except ResolveError:
+                pass
+
+        return values
+
+    def get_errors(self, environment_id: int) -> dict[str, str]:
+        """
+        Return the errors of the values of an environment that can't be
+        resolved. Call after `get_values()`.
+        """
+        return {
+            name: str(self.errors[environment_id, name])
+            for name in self.values.get(environment_id, {})
+            if (environment_id, name) in self.errors
+        }
+
+    def get_sources(self, environment_id: int) -> dict[str, list]:
+        return {
+            name: self.get_source((environment_id, name))
+            for name in self.values.get(environment_id, {})
+        }
+
+    def get_dependency_links(self, environment_id: int) -> dict[str, list[list]]:
+        # As stored in JSON
+        return {
+            name: [list(link) for link in links]
+            for name in self.values.get(environment_id, {})
+            if (links := self.get_links((environment_id, name)))
+        }
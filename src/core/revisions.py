@@ -0,0 +1,143 @@
+from core.adapters.spec import Delta, compute_delta
+from core.crypto import unseal_values
+from core.models import EnvironmentRevision
+
+# Every CHECKPOINT_INTERVAL-th revision stores all values, so reconstructing a
+# version never applies more than CHECKPOINT_INTERVAL - 1 deltas.
+CHECKPOINT_INTERVAL = 50
+
+
+def get_raw_data(sources: dict[str, list]) -> dict[str, str]:
+    """
+    Return the stored values of the items other than references, given the
+    `sources` of a snapshot.
+    """
+    return {
+        name: value
+        for name, (is_reference, value) in sources.items()
+        if not is_reference
+    }
+
+
+def make_changes(previous: dict[str, str], current: dict[str, str]) -> dict:
+    # Secrets are encrypted with a new nonce whenever they are sealed, so
+    # compare the decrypted values, but store the encrypted ones.
+    delta = compute_delta(unseal_values(previous), unseal_values(current))
+    return {
+        "set": {name: current[name] for name in [*delta.added, *delta.changed]},
+        "unset": delta.removed,
+    }
+
+
+def make_revision(
+    environment_id: int,
+    version: int,
+    content_hash: str,
+    previous: dict[str, str] | None,
+    current: dict[str, str],
+    *,
+    previous_raw_data: dict[str, str],
+    raw_data: dict[str, str],
+) -> EnvironmentRevision:
+    """
+    Create (but don't save) the revision for a new version of an environment,
+    given the previous version's values, if there is one, and the stored
+    values each version was resolved from.
+    """
+    if previous is None or (version - 1) % CHECKPOINT_INTERVAL == 0:
+        return EnvironmentRevision(
+            environment_id=environment_id,
+            version=version,
+            is_checkpoint=True,
+            content_hash=content_hash,
+            data=current,
+            raw_data=raw_data,
+        )
+
+    return EnvironmentRevision(
+        environment_id=environment_id,
+        version=version,
+        content_hash=content_hash,
+        data=make_changes(previous, current),
+        raw_data=make_changes(previous_raw_data, raw_data),
+    )
+
+
+def apply_revisions(
+    environment_id: int, version: int, field: str
+) -> dict[str, str] | None:
+    """
+    Return the `data` or `raw_data` of an environment at `version`, still
+    encrypted, or None if it wasn't recorded for one of the revisions needed.
+
+    Raises EnvironmentRevision.DoesNotExist for unknown versions.
+    """
+    checkpoint = (
+        EnvironmentRevision.objects.filter(
+            environment_id=environment_id,
+            version__lte=version,
+            is_checkpoint=True,
+        )
+        .order_by("-version")
+        .first()
+    )
+    if checkpoint is None:
+        raise EnvironmentRevision.DoesNotExist(
+            f"No revision {version} of environment {environment_id}"
+        )
+
+    values = getattr(checkpoint, field)
+    values = dict(values) if values is not None else None
+    deltas = EnvironmentRevision.objects.filter(
+        environment_id=environment_id,
+        version__gt=checkpoint.version,
+        version__lte=version,
+    ).order_by("version")
+
+    reached_version = checkpoint.version
+    for delta_version, data in deltas.values_list("version", field):
+        if delta_version != reached_version + 1:
+            break
+
+        if data is None:
+            values = None
+        elif values is not None:
+            values.update(data["set"])
+            for name in data["unset"]:
+                values.pop(name, None)
+        reached_version = delta_version
+
+    if reached_version != version:
+        raise EnvironmentRevision.DoesNotExist(
+            f"No revision {version} of environment {environment_id}"
+        )
+
+    return values
+
+
+def reconstruct(environment_id: int, version: int) -> dict[str, str]:
+    """
+    Return the values an environment had at `version`, decrypted.
+
+    Raises EnvironmentRevision.DoesNotExist for unknown versions.
+    """
+    return unseal_values(apply_revisions(environment_id, version, "data"))
+
+
+def reconstruct_raw(environment_id: int, version: int) -> dict[str, str] | None:
+    """
+    Return the stored values of the items other than references that an
+    environment's values were resolved from at `version`, decrypted, or None
+    for versions from before they were recorded.
+
+    Raises EnvironmentRevision.DoesNotExist for unknown versions.
+    """
+    raw_data = apply_revisions(environment_id, version, "raw_data")
+    return unseal_values(raw_data) if raw_data is not None else None
+
+
+def diff(environment_id: int, from_version: int, to_version: int) -> Delta:
+    return compute_delta(
+        reconstruct(environment_id, from_version),
+        reconstruct(environment_id, to_version),
+    )
@@ -0,0 +1,145 @@
+from typing import Iterable
+
+from attrs import define, field
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.crypto import escape, seal_many, unseal
+from core.fragment_cache import bump_service_versions
+from core.jobs import enqueue_sync
+from core.models import ConfigItem, ConfigItemValue, Environment
+from core.snapshots import rebuild_snapshots
+
+
+def environments_changed(environment_ids):
+    """
+    Update the snapshots of the given environments and queue a debounced push
+    of those whose content actually changed.
+    """
+    changed = rebuild_snapshots(environment_ids)
+    enqueue_sync(
+        changed,
+        delay=settings.CONFITURE_SYNC_DEBOUNCE,
+        max_delay=settings.CONFITURE_SYNC_MAX_DELAY,
+    )
+
+
+@define
+class PendingChanges:
+    """
+    What changed in the current transaction. Rows deleted by a queryset send
+    a signal each, so the changes are collected and processed once, after
+    commit.
+    """
+
+    environment_ids: set[int] = field(factory=set)
+    # Services whose items changed, which affects all their environments
+    service_ids: set[int] = field(factory=set)
+    # Services whose config table changed
+    table_service_ids: set[int] = field(factory=set)
+    # Items whose values changed, standing in for their service
+    table_item_ids: set[int] = field(factory=set)
+
+    def flush(self):
+        environment_ids = set(self.environment_ids)
+        if self.service_ids:
+            environment_ids.update(
+                Environment.objects.filter(service_id__in=self.service_ids).values_list(
+                    "id", flat=True
+                )
+            )
+        if environment_ids:
+            environments_changed(environment_ids)
+
+        service_ids = set(self.table_service_ids)
+        if self.table_item_ids:
+            # Items deleted in the meantime invalidated their service themselves
+            service_ids.update(
+                ConfigItem.objects.filter(id__in=self.table_item_ids).values_list(
+                    "service_id", flat=True
+                )
+            )
+        bump_service_versions(service_ids)
+
+
+def record_changes(**ids: Iterable[int]):
+    """
+    Add to the changes of the current transaction, given as PendingChanges
+    field names and ids.
+    """
+    connection = transaction.get_connection()
+    changes = getattr(connection, "confiture_pending_changes", None)
+    # Callbacks that ran, or were dropped by a rollback, are no longer listed
+    is_new = changes is None or not any(
+        func == changes.flush for _, func, _ in connection.run_on_commit
+    )
+    if is_new:
+        changes = connection.confiture_pending_changes = PendingChanges()
+
+    for name, values in ids.items():
+        getattr(changes, name).update(values)
+
+    # Outside of a transaction, this flushes right away
+    if is_new:
+        transaction.on_commit(changes.flush)
+
+
+@receiver(post_save, sender=ConfigItemValue)
+@receiver(post_delete, sender=ConfigItemValue)
+def on_value_change(sender, instance, **kwargs):
+    record_changes(
+        environment_ids=[instance.environment_id], table_item_ids=[instance.item_id]
+    )
+
+
+@receiver(post_save, sender=ConfigItem)
+@receiver(post_delete, sender=ConfigItem)
+def on_item_change(sender, instance, **kwargs):
+    record_changes(
+        service_ids=[instance.service_id], table_service_ids=[instance.service_id]
+    )
+
+
+@receiver(post_save, sender=Environment)
+@receiver(post_delete, sender=Environment)
+def on_environment_change(sender, instance, **kwargs):
+    record_changes(table_service_ids=[instance.service_id])
+
+
+def reseal_values(item: ConfigItem):
+    """
+    Encrypt the values of an item that became secret, or decrypt those of one
+    that no longer is.
+    """
+    with transaction.atomic():
+        values = list(
+            ConfigItemValue.objects.select_for_update()
+            .filter(item=item)
+            .values_list("id", "value")
+        )
+        plaintexts = [unseal(value) for _, value in values]
+        if item.is_secret:
+            stored = seal_many(plaintexts)
+        else:
+            stored = [escape(plaintext) for plaintext in plaintexts]
+
+        ConfigItemValue.objects.bulk_update(
+            [
+                ConfigItemValue(id=id, value=value)
+                for (id, _), value in zip(values, stored)
+            ],
+            ["value"],
+        )
+
+
+@receiver(post_save, sender=ConfigItem)
+def on_item_secrecy_change(sender, instance, created, **kwargs):
+    loaded_is_secret = getattr(instance, "_loaded_is_secret", None)
+    if created or loaded_is_secret in (None, instance.is_secret):
+        return
+
+    reseal_values(instance)
+    instance._loaded_is_secret = instance.is_secret
+    record_changes(service_ids=[instance.service_id])
@@ -0,0 +1,120 @@
+from typing import Iterable
+
+from django.db import transaction
+
+from core.adapters.spec import content_hash
+from core.crypto import unseal_values
+from core.models import EnvironmentRevision, EnvironmentSnapshot
+from core.refs import Resolver
+from core.revisions import get_raw_data, make_revision
+
+
+def rebuild_snapshots(environment_ids: Iterable[int]) -> set[int]:
+    """
+    Bring the snapshots of the given environments, and of the environments
+    referencing them, up to date, recording a revision for every changed one.
+
+    Returns the ids of the environments to push: those whose content changed,
+    and those whose values can all be resolved again.
+    """
+    resolver = Resolver.load(environment_ids)
+    environment_ids = resolver.environment_ids
+    if not environment_ids:
+        return set()
+
+    changed = set()
+    with transaction.atomic():
+        EnvironmentSnapshot.objects.bulk_create(
+            [
+                EnvironmentSnapshot(environment_id=environment_id)
+                for environment_id in environment_ids
+            ],
+            ignore_conflicts=True,
+        )
+        snapshots = list(
+            EnvironmentSnapshot.objects.select_for_update().filter(
+                environment_id__in=environment_ids
+            )
+        )
+        # Read the values after locking, so a concurrent rebuild cannot
+        # overwrite newer values with older ones.
+        resolver.load_values()
+        resolver.reuse(
+            [
+                *snapshots,
+                *EnvironmentSnapshot.objects.filter(
+                    environment_id__in=resolver.value_environment_ids - environment_ids
+                ),
+            ]
+        )
+
+        revisions = []
+        for snapshot in snapshots:
+            environment_id = snapshot.environment_id
+            data = resolver.get_values(environment_id)
+            errors = resolver.get_errors(environment_id)
+            # Keep the last value of what can't be resolved, rather than
+            # removing it from the environment on the next push
+            data.update(
+                (name, snapshot.data[name]) for name in errors if name in snapshot.data
+            )
+            fields = {
+                "data": data,
+                "sources": resolver.get_sources(environment_id),
+                "dependencies": resolver.get_dependency_links(environment_id),
+                "errors": errors,
+            }
+            if snapshot.errors and not errors:
+                changed.add(environment_id)
+
+            # Secret values stay encrypted in the snapshot. The hash is of the
+            # decrypted values, so re-encrypting them is not a change.
+            data_hash = content_hash(unseal_values(data))
+            if snapshot.content_hash == data_hash:
+                update_fields = [
+                    name
+                    for name, value in fields.items()
+                    if getattr(snapshot, name) != value
+                ]
+                if update_fields:
+                    for name in update_fields:
+                        setattr(snapshot, name, fields[name])
+                    snapshot.save(update_fields=[*update_fields, "updated_at"])
+                continue
+
+            previous = snapshot.data if snapshot.version else None
+            previous_sources = snapshot.sources
+            snapshot.version += 1
+            snapshot.content_hash = data_hash
+            for name, value in fields.items():
+                setattr(snapshot, name, value)
+            snapshot.save()
+            changed.add(environment_id)
+
+            revisions.append(
+                make_revision(
+                    snapshot.environment_id,
+                    snapshot.version,
+                    data_hash,
+                    previous,
+                    data,
+                    previous_raw_data=get_raw_data(previous_sources),
+                    raw_data=get_raw_data(fields["sources"]),
+                )
+            )
+
+        EnvironmentRevision.objects.bulk_create(revisions)
+
+    return changed
+
+
+def get_snapshot(environment_id: int) -> EnvironmentSnapshot:
+    """
+    Return the snapshot of an environment, building it if there is none yet.
+    """
+    snapshot = EnvironmentSnapshot.objects.filter(environment_id=environment_id).first()
+    if snapshot is None:
+        rebuild_snapshots([environment_id])
+        snapshot = EnvironmentSnapshot.objects.get(environment_id=environment_id)
+
+    return snapshot
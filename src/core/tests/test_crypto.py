@@ -0,0 +1,75 @@
+import pytest
+
+from core import crypto
+from core.models import (
+    ConfigItem,
+    ConfigItemValue,
+    Environment,
+    EnvironmentSnapshot,
+    Organization,
+    Project,
+    Service,
+)
+from core.reconcile import reconcile_environment
+
+LOOKS_SEALED = "enc:1:999:AAAA"
+
+
+@pytest.fixture
+def environment():
+    organization = Organization.objects.create(name="org")
+    project = Project.objects.create(name="project", organization=organization)
+    service = Service.objects.create(name="service", project=project)
+    return Environment.objects.create(name="prod", service=service)
+
+
+@pytest.mark.django_db
+def test_seal_and_unseal():
+    sealed = crypto.seal("hunter2")
+    assert crypto.is_sealed(sealed)
+    assert sealed != crypto.seal("hunter2")
+    assert crypto.unseal(sealed) == "hunter2"
+
+
+@pytest.mark.parametrize("value", ["plain", "enc:", "enc:0:x", LOOKS_SEALED])
+def test_escape(value):
+    assert crypto.unseal(crypto.escape(value)) == value
+    assert not crypto.is_sealed(crypto.escape(value))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_plaintext_that_looks_sealed(environment):
+    item = ConfigItem.objects.create(
+        service=environment.service, name="TOKEN", type=ConfigItem.Type.ENV
+    )
+    ConfigItemValue.objects.create(
+        item=item, environment=environment, value=LOOKS_SEALED
+    )
+    reconcile_environment(environment, {"TOKEN": LOOKS_SEALED, "OTHER": "enc:x"})
+
+    assert ConfigItemValue.objects.get(item=item).value == LOOKS_SEALED
+    snapshot = EnvironmentSnapshot.objects.get(environment=environment)
+    assert snapshot.get_values() == {"TOKEN": LOOKS_SEALED, "OTHER": "enc:x"}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_secrecy_change(environment):
+    item = ConfigItem.objects.create(
+        service=environment.service, name="TOKEN", type=ConfigItem.Type.ENV
+    )
+    ConfigItemValue.objects.create(item=item, environment=environment, value="abc")
+
+    def stored():
+        snapshot = EnvironmentSnapshot.objects.get(environment=environment)
+        value = ConfigItemValue.objects.values_list("value", flat=True).get()
+        return value, snapshot.data["TOKEN"]
+
+    item = ConfigItem.objects.get(id=item.id)
+    item.is_secret = True
+    item.save()
+    assert all(crypto.is_sealed(value) for value in stored())
+    assert ConfigItemValue.objects.get(item=item).value == "abc"
+
+    item.is_secret = False
+    item.save()
+    assert stored() == ("abc", "abc")
@@ -0,0 +1,57 @@
+import pytest
+
+from core.dotenv import DotenvError, parse_dotenv
+
+
+def test_parse_dotenv():
+    content = """
+# a comment
+PLAIN=value
+export EXPORTED=1
+SPACED = spaced value  # trailing comment
+EMPTY=
+SINGLE='literal $HOME \\n # not a comment'
+DOUBLE="tab\\there \\"quoted\\" \\$HOME"
+MULTI="first
+second"
+PLAIN=later
+"""
+    assert parse_dotenv(content) == {
+        "PLAIN": "later",
+        "EXPORTED": "1",
+        "SPACED": "spaced value",
+        "EMPTY": "",
+        "SINGLE": "literal $HOME \\n # not a comment",
+        "DOUBLE": 'tab\there "quoted" $HOME',
+        "MULTI": "first\nsecond",
+    }
+
+
+def test_parse_dotenv_empty():
+    assert parse_dotenv("") == {}
+    assert parse_dotenv("\n# only comments\n") == {}
+
+
+@pytest.mark.parametrize(
+    ("content", "message"),
+    [
+        ("not an assignment", "Line 1: expected NAME=value"),
+        ('OK=1\nOPEN="never closed\nMORE=2', "Line 2: unterminated quote"),
+        ("1NAME=value", "Line 1: expected NAME=value"),
+    ],
+)
+def test_parse_dotenv_errors(content, message):
+    with pytest.raises(DotenvError, match=message):
+        parse_dotenv(content)
+
+
+def test_import_form_rejects_replacing_with_nothing():
+    pytest.importorskip("django_magic_context")
+    from core.views.environment.index import ImportForm
+
+    form = ImportForm({"content": "", "replace": "on"})
+    assert not form.is_valid()
+
+    form = ImportForm({"content": ""})
+    assert form.is_valid()
+    assert form.cleaned_data["values"] == {}
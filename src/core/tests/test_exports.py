@@ -0,0 +1,59 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from core.models import (
+    ConfigItem,
+    ConfigItemValue,
+    Environment,
+    Organization,
+    Project,
+    Service,
+)
+
+
+@pytest.fixture
+def environment():
+    organization = Organization.objects.create(name="org")
+    project = Project.objects.create(name="project", organization=organization)
+    service = Service.objects.create(name="service", project=project)
+    environment = Environment.objects.create(name="prod", service=service)
+    for name in ["B", "A"]:
+        item = ConfigItem.objects.create(
+            service=service, name=name, type=ConfigItem.Type.ENV
+        )
+        ConfigItemValue.objects.create(
+            item=item, environment=environment, value=name.lower()
+        )
+    return environment
+
+
+def get_url(environment, format):
+    service = environment.service
+    return reverse(
+        "core:service-export",
+        args=(service.project.organization_id, service.project_id, service.id, format),
+    )
+
+
+@pytest.mark.django_db
+def test_export_streams_under_asgi(environment, admin_user):
+    # The URLconf imports every view
+    pytest.importorskip("django_magic_context")
+    client = Client()
+    client.force_login(admin_user)
+    response = client.get(get_url(environment, "env"))
+    assert not response.is_async
+    content = b"".join(response.streaming_content)
+    assert content == b"# service/prod\nA=a\nB=b\n"
+
+    async def get():
+        client = AsyncClient()
+        await client.aforce_login(admin_user)
+        response = await client.get(get_url(environment, "env"))
+        return response, [chunk async for chunk in response.streaming_content]
+
+    response, chunks = async_to_sync(get)()
+    assert response.is_async
+    assert b"".join(chunks) == content
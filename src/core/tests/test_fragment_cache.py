@@ -0,0 +1,37 @@
+import pytest
+from django.db import transaction
+
+from core.models import (
+    ConfigItem,
+    ConfigItemValue,
+    Environment,
+    Organization,
+    Project,
+    Service,
+)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_changes_bump_the_service_version():
+    organization = Organization.objects.create(name="org")
+    project = Project.objects.create(name="project", organization=organization)
+    service = Service.objects.create(name="service", project=project)
+
+    def get_version():
+        return Service.objects.values_list("config_version", flat=True).get()
+
+    environment = Environment.objects.create(name="prod", service=service)
+    assert get_version() == 1
+
+    with transaction.atomic():
+        for name in ["A", "B"]:
+            item = ConfigItem.objects.create(
+                service=service, name=name, type=ConfigItem.Type.ENV
+            )
+            ConfigItemValue.objects.create(
+                item=item, environment=environment, value="x"
+            )
+    assert get_version() == 2
+
+    ConfigItemValue.objects.filter(item__name="A").get().delete()
+    assert get_version() == 3
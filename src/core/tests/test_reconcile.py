@@ -0,0 +1,53 @@
+import pytest
+
+from core.models import (
+    ConfigItem,
+    ConfigItemValue,
+    Environment,
+    Organization,
+    Project,
+    Service,
+)
+from core.reconcile import reconcile_environment
+from core.snapshots import rebuild_snapshots
+
+
+@pytest.fixture
+def environment():
+    organization = Organization.objects.create(name="org")
+    project = Project.objects.create(name="project", organization=organization)
+    service = Service.objects.create(name="service", project=project)
+    return Environment.objects.create(name="prod", service=service)
+
+
+def get_values(environment):
+    return dict(
+        ConfigItemValue.objects.filter(environment=environment).values_list(
+            "item__name", "value"
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_pull_keeps_placeholders(environment):
+    for name, value in {"HOST": "db", "URL": "https://${HOST}"}.items():
+        item = ConfigItem.objects.create(
+            service=environment.service, name=name, type=ConfigItem.Type.ENV
+        )
+        ConfigItemValue.objects.create(item=item, environment=environment, value=value)
+    rebuild_snapshots([environment.id])
+
+    summary = reconcile_environment(
+        environment, {"HOST": "db", "URL": "https://db", "PORT": "80"}
+    )
+    assert summary.added == ["PORT"]
+    assert summary.changed == []
+    assert get_values(environment) == {
+        "HOST": "db",
+        "URL": "https://${HOST}",
+        "PORT": "80",
+    }
+
+    summary = reconcile_environment(environment, {"URL": "https://example.com"})
+    assert summary.changed == ["URL"]
+    assert get_values(environment)["URL"] == "https://example.com"
@@ -0,0 +1,157 @@
+import pytest
+
+from core import refs
+from core.models import (
+    ConfigItem,
+    ConfigItemValue,
+    Environment,
+    EnvironmentSnapshot,
+    Organization,
+    Project,
+    Service,
+)
+from core.snapshots import rebuild_snapshots
+
+
+@pytest.fixture
+def project():
+    organization = Organization.objects.create(name="org")
+    return Project.objects.create(name="project", organization=organization)
+
+
+@pytest.fixture
+def api(project):
+    service = Service.objects.create(name="api", project=project)
+    return Environment.objects.create(name="prod", service=service)
+
+
+@pytest.fixture
+def web(project):
+    service = Service.objects.create(name="web", project=project)
+    return Environment.objects.create(name="prod", service=service)
+
+
+def set_value(environment, name, value, type=ConfigItem.Type.ENV):
+    item, _ = ConfigItem.objects.get_or_create(
+        service=environment.service, name=name, defaults={"type": type}
+    )
+    ConfigItemValue.objects.update_or_create(
+        item=item, environment=environment, defaults={"value": value}
+    )
+
+
+def get_snapshot(environment):
+    return EnvironmentSnapshot.objects.get(environment=environment)
+
+
+@pytest.mark.django_db
+def test_references_and_placeholders(api, web):
+    set_value(api, "HOST", "db")
+    set_value(api, "URL", "postgres://${HOST}/${NAME}")
+    set_value(web, "DATABASE_URL", "api/prod/URL", ConfigItem.Type.REF)
+    set_value(web, "URL", "DATABASE_URL", ConfigItem.Type.REF)
+    rebuild_snapshots([api.id])
+
+    assert get_snapshot(api).get_values() == {
+        "HOST": "db",
+        "URL": "postgres://db/${NAME}",
+    }
+    assert get_snapshot(web).get_values() == {
+        "DATABASE_URL": "postgres://db/${NAME}",
+        "URL": "postgres://db/${NAME}",
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "values, error",
+    [
+        ({"A": "${B}", "B": "${A}"}, "A@{id} -> B@{id} -> A@{id}"),
+        ({"A": "x${A}"}, "A@{id} contains itself"),
+        ({"A": ("A", ConfigItem.Type.REF)}, "A@{id} refers to itself"),
+        ({"A": ("nowhere/prod/X", ConfigItem.Type.REF)}, "Invalid reference A@{id}"),
+        ({"A": ("X", ConfigItem.Type.REF)}, "Reference to missing value X@{id}"),
+    ],
+)
+def test_errors(api, values, error):
+    for name, value in values.items():
+        set_value(api, name, *value if isinstance(value, tuple) else [value])
+    rebuild_snapshots([api.id])
+
+    snapshot = get_snapshot(api)
+    assert snapshot.errors["A"] == error.format(id=api.id)
+    assert snapshot.data == {}
+
+
+@pytest.mark.django_db
+def test_errors_keep_the_last_value(api, web):
+    set_value(api, "HOST", "db")
+    set_value(web, "HOST", "api/prod/HOST", ConfigItem.Type.REF)
+    set_value(web, "URL", "https://${HOST}")
+    rebuild_snapshots([api.id])
+
+    set_value(web, "HOST", "api/staging/HOST")
+    assert rebuild_snapshots([web.id]) == set()
+
+    snapshot = get_snapshot(web)
+    assert snapshot.get_values() == {"HOST": "db", "URL": "https://db"}
+    assert snapshot.errors.keys() == {"HOST", "URL"}
+
+    set_value(web, "HOST", "api/prod/HOST")
+    assert rebuild_snapshots([web.id]) == {web.id}
+    assert get_snapshot(web).errors == {}
+
+
+@pytest.mark.django_db
+def test_only_downstream_values_are_evaluated_again(api, web, monkeypatch):
+    set_value(api, "HOST", "db")
+    set_value(api, "PORT", "5432")
+    set_value(api, "ADDRESS", "${HOST}:${PORT}")
+    set_value(api, "LABEL", "${PORT}")
+    set_value(web, "ADDRESS", "api/prod/ADDRESS", ConfigItem.Type.REF)
+    set_value(web, "URL", "https://${ADDRESS}")
+    set_value(web, "NAME", "${PORT}")
+    rebuild_snapshots([api.id])
+
+    compiled = []
+    compile_template = refs.compile_template
+
+    def compile_and_record(source):
+        compiled.append(source)
+        return compile_template(source)
+
+    monkeypatch.setattr(refs, "compile_template", compile_and_record)
+    set_value(api, "HOST", "db2")
+    set_value(web, "PORT", "80")
+    assert rebuild_snapshots([api.id, web.id]) == {api.id, web.id}
+
+    assert sorted(compiled) == [
+        "${HOST}:${PORT}",
+        "${PORT}",
+        "80",
+        "db2",
+        "https://${ADDRESS}",
+    ]
+    assert get_snapshot(api).get_values()["ADDRESS"] == "db2:5432"
+    assert get_snapshot(web).get_values() == {
+        "ADDRESS": "db2:5432",
+        "PORT": "80",
+        "URL": "https://db2:5432",
+        "NAME": "80",
+    }
+
+
+@pytest.mark.django_db
+def test_escapes(api):
+    set_value(api, "HOST", "db")
+    set_value(api, "LITERAL", "$${HOST}")
+    set_value(api, "MIXED", "$${HOST} is ${HOST}")
+    set_value(api, "DOLLARS", "$$ ${NAME} $${")
+    rebuild_snapshots([api.id])
+
+    assert get_snapshot(api).get_values() == {
+        "HOST": "db",
+        "LITERAL": "${HOST}",
+        "MIXED": "${HOST} is db",
+        "DOLLARS": "$$ ${NAME} ${",
+    }
@@ -0,0 +1,123 @@
+import pytest
+from django.core.management import call_command
+
+from core import crypto, revisions
+from core.models import (
+    ConfigItem,
+    ConfigItemValue,
+    Environment,
+    EnvironmentRevision,
+    Organization,
+    Project,
+    Service,
+)
+from core.revisions import diff, reconstruct, reconstruct_raw
+from core.snapshots import rebuild_snapshots
+
+
+@pytest.fixture
+def environment():
+    organization = Organization.objects.create(name="org")
+    project = Project.objects.create(name="project", organization=organization)
+    service = Service.objects.create(name="service", project=project)
+    return Environment.objects.create(name="prod", service=service)
+
+
+def set_values(environment, values, *, secret=()):
+    for name, value in values.items():
+        item, _ = ConfigItem.objects.get_or_create(
+            service=environment.service,
+            name=name,
+            defaults={"type": ConfigItem.Type.ENV, "is_secret": name in secret},
+        )
+        if value is None:
+            ConfigItemValue.objects.filter(item=item).delete()
+        else:
+            ConfigItemValue.objects.update_or_create(
+                item=item, environment=environment, defaults={"value": value}
+            )
+    rebuild_snapshots([environment.id])
+
+
+def get_revision(environment, version):
+    return EnvironmentRevision.objects.get(environment=environment, version=version)
+
+
+@pytest.mark.django_db
+def test_deltas_and_checkpoints(environment, monkeypatch):
+    monkeypatch.setattr(revisions, "CHECKPOINT_INTERVAL", 3)
+    set_values(environment, {"HOST": "db", "URL": "https://${HOST}"})
+    set_values(environment, {"HOST": "db2", "PORT": "80"})
+    set_values(environment, {"PORT": None})
+    set_values(environment, {"URL": "https://${HOST}:80"})
+
+    assert get_revision(environment, 1).is_checkpoint
+    assert get_revision(environment, 2).data == {
+        "set": {"HOST": "db2", "PORT": "80", "URL": "https://db2"},
+        "unset": [],
+    }
+    assert get_revision(environment, 3).data == {"set": {}, "unset": ["PORT"]}
+    assert get_revision(environment, 4).is_checkpoint
+
+    assert reconstruct(environment.id, 1) == {"HOST": "db", "URL": "https://db"}
+    assert reconstruct(environment.id, 2) == {
+        "HOST": "db2",
+        "PORT": "80",
+        "URL": "https://db2",
+    }
+    assert reconstruct(environment.id, 3) == {"HOST": "db2", "URL": "https://db2"}
+    assert reconstruct_raw(environment.id, 3) == {
+        "HOST": "db2",
+        "URL": "https://${HOST}",
+    }
+    assert reconstruct(environment.id, 4) == {"HOST": "db2", "URL": "https://db2:80"}
+
+    delta = diff(environment.id, 1, 4)
+    assert delta.changed == {"HOST": "db2", "URL": "https://db2:80"}
+    with pytest.raises(EnvironmentRevision.DoesNotExist):
+        reconstruct(environment.id, 5)
+
+
+@pytest.mark.django_db
+def test_unchanged_secrets_are_not_in_deltas(environment):
+    set_values(
+        environment,
+        {"PASSWORD": "hunter2", "URL": "https://${PASSWORD}@db"},
+        secret={"PASSWORD"},
+    )
+    set_values(environment, {"PASSWORD": "hunter2", "PORT": "80"})
+
+    data = get_revision(environment, 2).data
+    assert data == {"set": {"PORT": "80"}, "unset": []}
+    checkpoint = get_revision(environment, 1)
+    assert all(map(crypto.is_sealed, checkpoint.data.values()))
+    assert crypto.is_sealed(checkpoint.raw_data["PASSWORD"])
+
+
+@pytest.mark.django_db
+def test_rollback_restores_values_as_entered(environment):
+    set_values(environment, {"HOST": "db", "URL": "https://${HOST}", "OLD": "x"})
+    set_values(environment, {"URL": "https://example.com", "OLD": None})
+
+    call_command("env_history", environment.id, rollback=1)
+    rebuild_snapshots([environment.id])
+
+    assert dict(
+        ConfigItemValue.objects.filter(environment=environment).values_list(
+            "item__name", "value"
+        )
+    ) == {"HOST": "db", "URL": "https://${HOST}", "OLD": "x"}
+    assert reconstruct(environment.id, 3) == reconstruct(environment.id, 1)
+
+
+@pytest.mark.django_db
+def test_rollback_before_raw_data(environment):
+    set_values(environment, {"HOST": "db", "URL": "https://${HOST}"})
+    EnvironmentRevision.objects.update(raw_data=None)
+    set_values(environment, {"HOST": "db2"})
+    assert reconstruct_raw(environment.id, 2) is None
+
+    call_command("env_history", environment.id, rollback=1)
+    rebuild_snapshots([environment.id])
+
+    assert reconstruct(environment.id, 3) == reconstruct(environment.id, 1)
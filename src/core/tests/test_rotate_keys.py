@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from django.core.management import call_command
+
+from core import crypto
+from core.models import (
+    ConfigItem,
+    ConfigItemValue,
+    Environment,
+    EnvironmentRevision,
+    EnvironmentSnapshot,
+    Organization,
+    Project,
+    Service,
+)
+from core.snapshots import rebuild_snapshots
+
+SECRET = "hunter2"
+
+
+@pytest.fixture
+def environment():
+    organization = Organization.objects.create(name="org")
+    project = Project.objects.create(name="project", organization=organization)
+    service = Service.objects.create(name="service", project=project)
+    return Environment.objects.create(name="prod", service=service)
+
+
+def stored_data(model):
+    return json.dumps(list(model.objects.values_list("data", flat=True)))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reseal_leaves_no_plaintext_secrets(environment):
+    password = ConfigItem.objects.create(
+        service=environment.service, name="PASSWORD", type=ConfigItem.Type.ENV
+    )
+    url = ConfigItem.objects.create(
+        service=environment.service, name="URL", type=ConfigItem.Type.ENV
+    )
+    value = ConfigItemValue.objects.create(
+        item=password, environment=environment, value="changeme"
+    )
+    ConfigItemValue.objects.create(
+        item=url, environment=environment, value="db://${PASSWORD}@db"
+    )
+    rebuild_snapshots([environment.id])
+    # A checkpoint and a delta revision
+    value.value = SECRET
+    value.save()
+    rebuild_snapshots([environment.id])
+
+    # Made secret before values were encrypted: the value, the snapshot and
+    # the revisions all hold it in plain text.
+    ConfigItem.objects.filter(id=password.id).update(is_secret=True)
+    assert SECRET in stored_data(EnvironmentSnapshot)
+    assert SECRET in stored_data(EnvironmentRevision)
+
+    call_command("rotate_keys", "--reseal")
+
+    assert SECRET not in stored_data(EnvironmentSnapshot)
+    assert SECRET not in stored_data(EnvironmentRevision)
+    stored_value = ConfigItemValue.objects.values_list("value", flat=True).get(
+        item=password
+    )
+    assert crypto.is_sealed(stored_value)
+
+    snapshot = EnvironmentSnapshot.objects.get(environment=environment)
+    assert snapshot.get_values() == {"PASSWORD": SECRET, "URL": f"db://{SECRET}@db"}
@@ -13,3 +13,5 @@ class ConfigTableRow:
 class ConfigTable:
     headers: list[str]
     rows: list[ConfigTableRow]
+    # Name of the last row, if there are more rows after it
+    next_after: str | None = None
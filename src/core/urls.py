@@ -1,50 +1,21 @@
 from django.urls import path, include, register_converter
-from sqids import Sqids
 
+from core.converters import (
+    EnvironmentIdConverter,
+    OrgIdConverter,
+    ProjectIdConverter,
+    ServiceIdConverter,
+    SqidConverter,
+)
 from core.views import index
+from core.views.api import index as api_index
 from core.views.environment import index as environment_index
+from core.views.export import index as export_index
 from core.views.org import index as org_index
 from core.views.project import index as project_index
 from core.views.service.index import view as service_index
 
 
-class SqidConverter:
-    prefix = "id-"
-    alphabet = "abcdefghkmnopqrstuvwxyz23456789"
-
-    def __init__(self):
-        self.sqids = Sqids(alphabet=self.alphabet, min_length=4)
-        self.regex = f"{self.prefix}[a-zA-Z0-9]*"
-
-    def to_python(self, value):
-        value = value.removeprefix(self.prefix)
-        decoded_value, *rest = self.sqids.decode(value)
-        if rest:
-            raise ValueError()
-
-        return decoded_value
-
-    def to_url(self, value):
-        encoded_value = self.sqids.encode([int(value)])
-        return f"{self.prefix}{encoded_value}"
-
-
-class OrgIdConverter(SqidConverter):
-    prefix = "o-"
-
-
-class ProjectIdConverter(SqidConverter):
-    prefix = "p-"
-
-
-class ServiceIdConverter(SqidConverter):
-    prefix = "s-"
-
-
-class EnvironmentIdConverter(SqidConverter):
-    prefix = "e-"
-
-
 register_converter(SqidConverter, "sqid")
 register_converter(OrgIdConverter, "org-id")
 register_converter(ProjectIdConverter, "project-id")
@@ -55,6 +26,12 @@ register_converter(EnvironmentIdConverter, "environment-id")
 app_name = "core"
 urlpatterns = [
     path("o/", index.view, name="index"),
+    path(
+        "api/v1/environments/<environment-id:environment_id>/<str:format>/",
+        api_index.environment_view,
+        name="api-environment",
+    ),
+    path("api/v1/watch/", api_index.watch_view, name="api-watch"),
     path(
         "o/<org-id:org_id>/",
         org_index.view,
@@ -65,6 +42,16 @@ urlpatterns = [
         project_index.view,
         name="project-detail",
     ),
+    path(
+        "o/<org-id:org_id>/p/<project-id:project_id>/export/<str:format>/",
+        export_index.project_view,
+        name="project-export",
+    ),
+    path(
+        "o/<org-id:org_id>/p/<project-id:project_id>/s/<service-id:service_id>/export/<str:format>/",
+        export_index.service_view,
+        name="service-export",
+    ),
     path(
         "o/<org-id:org_id>/p/<project-id:project_id>/s/<service-id:service_id>/",
         include(service_index.urls),
@@ -74,4 +61,9 @@ urlpatterns = [
         environment_index.view,
         name="environment-detail",
     ),
+    path(
+        "o/<org-id:org_id>/p/<project-id:project_id>/s/<service-id:service_id>/e/<environment-id:environment_id>/export/<str:format>/",
+        export_index.environment_view,
+        name="environment-export",
+    ),
 ]
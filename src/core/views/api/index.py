@@ -0,0 +1,159 @@
+import json
+
+from django.conf import settings
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils.cache import parse_etags
+from django.views.decorators.http import require_GET
+
+from core.api_tokens import get_bearer_token, hash_token
+from core.converters import EnvironmentIdConverter
+from core.exports import FORMATS, get_exported_environment
+from core.models import ApiToken, Environment, EnvironmentSnapshot
+from core.snapshots import rebuild_snapshots
+from core.watch import broadcaster
+
+
+def unauthorized():
+    response = HttpResponse("Invalid or missing API token", status=401)
+    response["WWW-Authenticate"] = 'Bearer realm="confiture"'
+    return response
+
+
+def make_etag(content_hash, format):
+    return f'"{content_hash[:32]}-{format}"'
+
+
+def matches(if_none_match, etag):
+    # If-None-Match uses the weak comparison
+    etags = parse_etags(if_none_match)
+    return "*" in etags or etag in [e.removeprefix("W/") for e in etags]
+
+
+@require_GET
+def environment_view(request, environment_id, format):
+    """
+    Return the resolved values of an environment, for a bearer token of its
+    project. Conditional requests with a matching ETag cost a single query.
+    """
+    export_format = FORMATS.get(format)
+    if export_format is None:
+        raise Http404("Unknown format")
+
+    token = get_bearer_token(request)
+    if token is None:
+        return unauthorized()
+
+    digest = hash_token(token)
+    content_hash = (
+        EnvironmentSnapshot.objects.filter(
+            environment_id=environment_id,
+            environment__service__project__apitoken__digest=digest,
+        )
+        .values_list("content_hash", flat=True)
+        .first()
+    )
+    if content_hash is None:
+        environments = Environment.objects.filter(
+            id=environment_id, service__project__apitoken__digest=digest
+        )
+        if not environments.exists():
+            return unauthorized()
+
+        rebuild_snapshots([environment_id])
+
+    etag = make_etag(content_hash, format) if content_hash else None
+    if etag and matches(request.headers.get("If-None-Match", ""), etag):
+        response = HttpResponseNotModified()
+    else:
+        snapshot = EnvironmentSnapshot.objects.select_related(
+            "environment__service"
+        ).get(environment_id=environment_id)
+        etag = make_etag(snapshot.content_hash, format)
+        response = HttpResponse(
+            export_format.write([get_exported_environment(snapshot)], True),
+            content_type=f"{export_format.content_type}; charset=utf-8",
+        )
+
+    response["ETag"] = etag
+    # Secrets must not end up in shared caches, and clients should revalidate
+    # every time, which is cheap.
+    response["Cache-Control"] = "private, no-cache"
+    response["Vary"] = "Authorization"
+    return response
+
+
+def format_event(environment_id, version):
+    data = json.dumps(
+        {
+            "environment": EnvironmentIdConverter().to_url(environment_id),
+            "version": version,
+        }
+    )
+    return f"event: version\ndata: {data}\n\n"
+
+
+async def stream_changes(subscription):
+    try:
+        yield "retry: 5000\n\n"
+        for environment_id, version in subscription.versions.items():
+            yield format_event(environment_id, version)
+
+        while True:
+            changes = await subscription.wait(settings.CONFITURE_WATCH_KEEPALIVE)
+            if not changes:
+                yield ": keepalive\n\n"
+
+            for environment_id, version in changes.items():
+                yield format_event(environment_id, version)
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+@require_GET
+async def watch_view(request):
+    """
+    Send a server-sent event with the new version whenever the values of a
+    watched environment change: all environments of the token's project, or
+    those given as ?environment=<id>.
+
+    Needs the ASGI application; clients are served by one task each, while
+    a single poller checks the versions of all watched environments.
+    """
+    token = get_bearer_token(request)
+    api_token = (
+        token and await ApiToken.objects.filter(digest=hash_token(token)).afirst()
+    )
+    if not api_token:
+        return unauthorized()
+
+    environments = Environment.objects.filter(service__project_id=api_token.project_id)
+    if environment_ids := request.GET.getlist("environment"):
+        try:
+            environments = environments.filter(
+                id__in=[EnvironmentIdConverter().to_python(e) for e in environment_ids]
+            )
+        except ValueError:
+            raise Http404("Unknown environment")
+
+    versions = {
+        environment_id: version or 0
+        async for environment_id, version in environments.values_list(
+            "id", "environmentsnapshot__version"
+        )
+    }
+    if not versions:
+        raise Http404("No environments to watch")
+
+    response = StreamingHttpResponse(
+        stream_changes(broadcaster.subscribe(versions)),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    # Don't let nginx buffer the events
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -1,69 +1,91 @@
-from typing import Callable
-
 import django_magic_context as magic
-from django.http.response import HttpResponse
+from django import forms
+from django.http.response import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.template.response import TemplateResponse
 from django.utils.translation import gettext_lazy as _
 
-from core.models import ConfigItem, Environment
-from core.types import ConfigTable
-
-
-def get_config_table(environment) -> ConfigTable:
-    rows = ConfigItem.objects.filter(environment=environment)
-    return ConfigTable(headers=[_("Name"), _("Value")], rows=rows)
-
-
-def get_config_table_row_form(item_id):
-    item = get_object_or_404(ConfigItem, id=item_id)
-    return ConfigTableRowForm(id=item_id, instance=item)
+from core.contexts.config_table import get_environment_config_table
+from core.dotenv import DotenvError, parse_dotenv
+from core.exports import export_for
+from core.models import ConfigItem, Environment, EnvironmentSnapshot
+from core.reconcile import reconcile_environment
 
+EXPORT_FORMATS = [
+    ("env", ".env"),
+    ("envrc", ".envrc"),
+    ("docker", _("Docker env file")),
+    ("json", "JSON"),
+    ("yaml", "YAML"),
+    ("configmap", _("Kubernetes ConfigMap")),
+    ("secret", _("Kubernetes Secret")),
+]
 
-def get_config_table_row_item(item_id):
-    item = get_object_or_404(ConfigItem, id=item_id)
-    return item
 
-
-def hx_target(request, test: Callable[[str], bool]) -> bool:
-    header = request.headers.get("HX-Target")
-    if not header:
-        return False
-
-    return test(header)
+def handle_clipboard(request, *, format, environment):
+    return StreamingHttpResponse(
+        export_for(
+            request,
+            Environment.objects.filter(id=environment.id),
+            format,
+            single=True,
+        ),
+        content_type="text/plain; charset=utf-8",
+    )
 
 
-def handle_save(request, item_id, environment):
-    form = ConfigTableRowForm(
-        request.POST,
-        id=item_id,
-        instance=ConfigItem.objects.filter(id=item_id, environment=environment).first(),
+class ImportForm(forms.Form):
+    content = forms.CharField(required=False, widget=forms.Textarea)
+    file = forms.FileField(required=False)
+    replace = forms.BooleanField(
+        required=False, help_text=_("Remove values that are not in the file")
     )
-    if form.is_valid():
-        item = form.save(commit=False)
-        item.type = ConfigItem.Type.ENV
-        item.environment = environment
-        item.save()
-        item_id = item.id
 
-    return item_id
+    def clean(self):
+        cleaned_data = super().clean()
+        if file := cleaned_data.get("file"):
+            try:
+                content = file.read().decode("utf-8-sig")
+            except UnicodeDecodeError:
+                raise forms.ValidationError(_("The file is not UTF-8 encoded"))
+        else:
+            content = cleaned_data.get("content", "")
 
+        try:
+            values = parse_dotenv(content)
+        except DotenvError as e:
+            raise forms.ValidationError(str(e))
 
-def handle_delete(request, item_id):
-    ConfigItem.objects.filter(id=item_id).delete()
-    return HttpResponse(status=200)
+        if not values and cleaned_data.get("replace"):
+            # Replacing with nothing would remove every value
+            raise forms.ValidationError(_("There are no values to import"))
 
+        max_length = ConfigItem._meta.get_field("name").max_length
+        if too_long := [name for name in values if len(name) > max_length]:
+            raise forms.ValidationError(
+                _("Names longer than %(max_length)d characters: %(names)s")
+                % {"max_length": max_length, "names": ", ".join(too_long)}
+            )
 
-def handle_clipboard(request, *, format, environment):
-    items = ConfigItem.objects.filter(environment=environment).order_by("name")
-    if format == "env":
-        content = "\n".join(f"{item.name}={item.value}" for item in items)
-    elif format == "envrc":
-        content = "\n".join(f"export {item.name}={item.value}" for item in items)
-    else:
-        raise HttpResponse(status=400)
+        cleaned_data["values"] = values
+        return cleaned_data
 
-    return HttpResponse(content)
+
+def handle_import(request, *, environment):
+    form = ImportForm(request.POST, request.FILES)
+    summary = None
+    if form.is_valid():
+        summary = reconcile_environment(
+            environment,
+            form.cleaned_data["values"],
+            prune=form.cleaned_data["replace"],
+        )
+
+    return TemplateResponse(
+        request,
+        "core/environment_index.html#import_summary",
+        {"import_form": form, "import_summary": summary},
+    )
 
 
 def view(request, org_id, project_id, service_id, environment_id):
@@ -79,37 +101,37 @@ def view(request, org_id, project_id, service_id, environment_id):
         service__project__organization_id=org_id,
     )
 
-    item_id = request.GET.get("item")
-
     action = request.GET.get("action") or request.POST.get("action")
     method = request.method
+    after = request.GET.get("after")
 
-    if action == "save" and method == "POST":
-        item_id = handle_save(request, item_id, environment)
-    elif action == "delete" and item_id:
-        return handle_delete(request, item_id)
+    if action == "import" and method == "POST":
+        return handle_import(request, environment=environment)
     elif action == "clipboard-env":
         return handle_clipboard(request, environment=environment, format="env")
     elif action == "clipboard-envrc":
         return handle_clipboard(request, environment=environment, format="envrc")
 
     context = magic.resolve(
+        org_id=org_id,
+        project_id=project_id,
+        service_id=service_id,
         environment=environment,
+        environments=[environment],
         service=environment.service,
         project=environment.service.project,
         organization=environment.service.project.organization,
-        config_table_row_empty_form=ConfigTableRowForm(id=item_id),
-        item_id=item_id,
-        config_table=get_config_table,
-        config_table_row_form=get_config_table_row_form,
-        config_table_row_item=get_config_table_row_item,
+        after=after,
+        resolve_errors=EnvironmentSnapshot.objects.filter(environment=environment)
+        .values_list("errors", flat=True)
+        .first(),
+        import_form=ImportForm(),
+        export_formats=EXPORT_FORMATS,
+        config_table=get_environment_config_table,
     )
 
     template_name = "core/environment_index.html"
-    if hx_target(request, lambda x: x.startswith("config_table_row")):
-        if action == "edit":
-            template_name += "#config_table_row_form"
-        else:
-            template_name += "#config_table_row_view"
+    if after and request.headers.get("HX-Request"):
+        template_name += "#config_table_page"
 
     return TemplateResponse(request, template_name, context)
@@ -0,0 +1,64 @@
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.text import slugify
+
+from core.exports import FORMATS, export_for
+from core.models import Environment, Project, Service
+
+
+def stream(request, environments, format, filename, *, single=False):
+    export_format = FORMATS.get(format)
+    if export_format is None:
+        raise Http404("Unknown export format")
+
+    response = StreamingHttpResponse(
+        export_for(request, environments, format, single=single),
+        content_type=f"{export_format.content_type}; charset=utf-8",
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{slugify(filename)}.{export_format.extension}"'
+    )
+    return response
+
+
+@login_required
+def environment_view(request, org_id, project_id, service_id, environment_id, format):
+    environment = get_object_or_404(
+        Environment.objects.select_related("service"),
+        id=environment_id,
+        service_id=service_id,
+        service__project_id=project_id,
+        service__project__organization_id=org_id,
+    )
+    return stream(
+        request,
+        Environment.objects.filter(id=environment.id),
+        format,
+        f"{environment.service.name}-{environment.name}",
+        single=True,
+    )
+
+
+@login_required
+def service_view(request, org_id, project_id, service_id, format):
+    service = get_object_or_404(
+        Service,
+        id=service_id,
+        project_id=project_id,
+        project__organization_id=org_id,
+    )
+    return stream(
+        request, Environment.objects.filter(service=service), format, service.name
+    )
+
+
+@login_required
+def project_view(request, org_id, project_id, format):
+    project = get_object_or_404(Project, id=project_id, organization_id=org_id)
+    return stream(
+        request,
+        Environment.objects.filter(service__project=project),
+        format,
+        project.name,
+    )
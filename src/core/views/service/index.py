@@ -1,8 +1,11 @@
 from collections import defaultdict
+from functools import cache
 from typing import Any, Callable
 from attrs import define, field
-from django.http import HttpResponse
-from django.template import RequestContext, Template
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.middleware.csrf import get_token
+from django.template import Context, Template
 from django.urls import path
 import django_magic_context as magic
 from django import forms
@@ -11,26 +14,33 @@ from django.template.response import TemplateResponse
 from django.utils.translation import gettext_lazy as _
 
 from core.contexts.breadcrumbs import get_breadcrumbs
-from core.models import ConfigItem, ConfigItemValue, Environment, Service
-from core.types import ConfigTable, ConfigTableRow
+from core.contexts.config_table import get_config_table, get_environments
+from core.models import ConfigItem, ConfigItemValue, Service
+from core.types import ConfigTableRow
 
 
 @define
 class Dispatcher:
     context_factory: Callable[..., dict[str, Any]]
 
-    registry: Any = field(factory=lambda: defaultdict(list))
-    paths: list[Any] = field(factory=list)
+    # Handlers by (url name, HTTP method), so dispatching is a single lookup
+    routes: dict[tuple[str, str], Callable] = field(factory=dict)
+    methods: dict[str, list[str]] = field(factory=lambda: defaultdict(list))
+    paths: dict[str, Any] = field(factory=dict)
 
     @property
     def urls(self):
-        return self.paths
+        return list(self.paths.values())
 
-    def guard(self, *paths, **kwargs):
+    def guard(self, *paths, method):
         def decorator(decoratee):
             for p in paths:
-                self.registry[p.name].append((kwargs, decoratee))
-                self.paths.append(p)
+                if (p.name, method) in self.routes:
+                    raise ImproperlyConfigured(f"Duplicate route {method} {p.name}")
+
+                self.routes[p.name, method] = decoratee
+                self.methods[p.name].append(method)
+                self.paths.setdefault(p.name, p)
 
             return decoratee
 
@@ -40,23 +50,13 @@ class Dispatcher:
         return path(*args, view=self.view, **kwargs)
 
     def view(self, request, **kwargs):
-        context = self.context_factory(request, **kwargs)
-
-        for expectations, handler in self.registry[request.resolver_match.url_name]:
-            for key, expected_value in expectations.items():
-                try:
-                    value = cget(context, key)
-                except KeyError:
-                    break
+        url_name = request.resolver_match.url_name
+        handler = self.routes.get((url_name, request.method))
+        if handler is None:
+            return HttpResponseNotAllowed(self.methods[url_name])
 
-                if callable(expected_value):
-                    if not expected_value(value):
-                        break
-                else:
-                    if value != expected_value:
-                        break
-            else:
-                return handler(context)
+        context = self.context_factory(request, **kwargs)
+        return handler(context)
 
 
 NO_DEFAULT = object()
@@ -85,19 +85,42 @@ def get_item(item_id):
 
 
 def get_item_value(item_id, env_id):
-    return ConfigItemValue.objects.filter(
-        item_id=item_id, environment_id=env_id
-    ).first()
+    return (
+        ConfigItemValue.objects.filter(item_id=item_id, environment_id=env_id)
+        .select_related("item")
+        .first()
+    )
+
+
+class ItemForm(forms.ModelForm):
+    class Meta:
+        model = ConfigItem
+        fields = ["name"]
 
+    def clean_name(self):
+        # The form has no service field, so the model's unique constraint
+        # isn't validated.
+        name = self.cleaned_data["name"]
+        duplicates = ConfigItem.objects.filter(
+            service_id=self.instance.service_id, name=name
+        ).exclude(id=self.instance.id)
+        if duplicates.exists():
+            raise forms.ValidationError(
+                _("An item named %(name)s already exists."), params={"name": name}
+            )
 
-def get_item_form(request, item_id):
-    item = ConfigItem.objects.filter(id=item_id).first()
+        return name
+
+
+def get_item_form(request, service, item_id):
+    item = ConfigItem.objects.filter(id=item_id, service=service).first()
+    if item is None:
+        item = ConfigItem(service=service)
 
-    Form = forms.modelform_factory(model=ConfigItem, fields=["name"])
     if request.method == "GET":
-        form = Form(instance=item)
+        form = ItemForm(instance=item)
     else:
-        form = Form(request.POST, instance=item)
+        form = ItemForm(request.POST, instance=item)
 
     return form
 
@@ -121,44 +144,6 @@ def get_item_value_form(request, item_id, env_id):
     return form
 
 
-def get_environments(org, project, service):
-    environments = Environment.objects.filter(
-        service=service,
-        service__project=project,
-        service__project__organization=org,
-    ).order_by("name")
-    return environments
-
-
-def get_config_table(org, project, service, environments) -> ConfigTable:
-    items = ConfigItem.objects.filter(
-        service=service,
-        service__project=project,
-        service__project__organization=org,
-    ).order_by("name")
-
-    values_dict = {
-        (item_value.item_id, item_value.environment_id): item_value
-        for item_value in ConfigItemValue.objects.filter(item_id__in=items)
-    }
-
-    rows = [
-        ConfigTableRow(
-            item=item,
-            values=[values_dict.get((item.id, env.id)) for env in environments],
-        )
-        for item in items
-    ]
-
-    return ConfigTable(
-        headers=[
-            _("Name"),
-            *[e.name for e in environments],
-        ],
-        rows=rows,
-    )
-
-
 def make_context(request, org_id, project_id, service_id, **kwargs):
     service = get_object_or_404(
         Service.objects.select_related(
@@ -182,21 +167,41 @@ def make_context(request, org_id, project_id, service_id, **kwargs):
         service=service,
         environments=get_environments,
         config_table=get_config_table,
+        service_version=service.config_version,
         breadcrumbs=get_breadcrumbs,
         **kwargs,
     )
 
 
-def render_component(context, name, **kwargs):
-    request = context["request"]
+# Context entries components may use besides their own attributes
+COMPONENT_CONTEXT_KEYS = ["org_id", "project_id", "service_id"]
 
-    attrs = " ".join(f':{key}="{key}"' for key in kwargs.keys())
 
-    request_context = RequestContext(request, kwargs)
-    request_context.update(context)
+@cache
+def get_component_template(name: str, attrs: tuple[str, ...]) -> Template:
+    attributes = " ".join(f':{key}="{key}"' for key in attrs)
+    return Template(f"{{% c {name} {attributes} %}}{{% endc %}}")
 
-    template = Template(f"{{% c {name} {attrs} %}}{{% endc %}}")
-    rendered = template.render(request_context)
+
+def render_component(context, name, **kwargs):
+    """
+    Render a component for an htmx response, passing the keyword arguments as
+    its attributes. The wrapper template is compiled once per component and
+    set of attributes, and only gets the variables components use.
+    """
+    request = context["request"]
+
+    template = get_component_template(name, tuple(kwargs))
+    rendered = template.render(
+        Context(
+            {
+                **{key: context[key] for key in COMPONENT_CONTEXT_KEYS},
+                "request": request,
+                "csrf_token": get_token(request),
+                **kwargs,
+            }
+        )
+    )
     return HttpResponse(rendered)
 
 
@@ -243,15 +248,14 @@ def handle_item_get(context):
 )
 def handle_item_post(context):
     request = cget(context, "request")
-    item_id = cget(context, "item_id", default=None)
-    form = get_item_form(request, item_id)
+    item_id, service = cget(context, "item_id", "service", default=None)
+    form = get_item_form(request, service, item_id)
     is_new = not form.instance.id
     if not form.is_valid():
         return render_item_form(context, form)
 
     item = form.save(commit=False)
     item.type = ConfigItem.Type.ENV
-    item.service = cget(context, "service")
     item.save()
 
     if is_new:
@@ -277,8 +281,8 @@ def handle_item_delete(context):
 )
 def handle_item_edit(context):
     request = cget(context, "request")
-    item_id = cget(context, "item_id", default=None)
-    form = get_item_form(request, item_id)
+    item_id, service = cget(context, "item_id", "service", default=None)
+    form = get_item_form(request, service, item_id)
     return render_item_form(context, form)
 
 
@@ -287,10 +291,16 @@ def handle_item_edit(context):
     method="GET",
 )
 def handle_value_get(context):
-    item_id, env_id = cget(context, "item_id", "env_id")
+    request, item_id, env_id = cget(context, "request", "item_id", "env_id")
     value = get_item_value(item_id, env_id)
     return render_component(
-        context, "config.item-value", item_id=item_id, env_id=env_id, value=value
+        context,
+        "config.item-value",
+        item_id=item_id,
+        env_id=env_id,
+        value=value,
+        secret=value is not None and value.item.is_secret,
+        reveal="reveal" in request.GET,
     )
 
 
@@ -310,7 +320,12 @@ def handle_value_post(context):
     value.save()
 
     return render_component(
-        context, "config.item-value", item_id=item_id, env_id=env_id, value=value
+        context,
+        "config.item-value",
+        item_id=item_id,
+        env_id=env_id,
+        value=value,
+        secret=value.item.is_secret,
     )
 
 
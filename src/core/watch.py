@@ -0,0 +1,111 @@
+import asyncio
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from attrs import define, field
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+
+from core.models import EnvironmentSnapshot
+
+
+@define(eq=False)
+class Subscription:
+    """
+    The environments a client watches. Changes are coalesced, so a slow
+    client only gets the latest version of each environment.
+    """
+
+    # Latest version by environment id, as known to the client
+    versions: dict[int, int]
+    pending: dict[int, int] = field(factory=dict)
+    event: asyncio.Event = field(factory=asyncio.Event)
+
+    def notify(self, environment_id: int, version: int):
+        if self.versions.get(environment_id) == version:
+            return
+
+        self.versions[environment_id] = version
+        self.pending[environment_id] = version
+        self.event.set()
+
+    async def wait(self, timeout: float) -> dict[int, int]:
+        """
+        Wait up to `timeout` seconds for changes, and return them.
+        """
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except TimeoutError:
+            pass
+
+        self.event.clear()
+        changes, self.pending = self.pending, {}
+        return changes
+
+
+@define
+class Broadcaster:
+    """
+    Tells subscriptions about new snapshot versions.
+
+    One task per process polls the versions of all watched environments with
+    a single query, no matter how many clients watch them. It stops when the
+    last subscription is gone.
+    """
+
+    subscriptions: dict[int, set[Subscription]] = field(
+        factory=lambda: defaultdict(set)
+    )
+    versions: dict[int, int] = field(factory=dict)
+    task: asyncio.Task | None = None
+
+    def subscribe(self, versions: dict[int, int]) -> Subscription:
+        subscription = Subscription(versions=dict(versions))
+        for environment_id in versions:
+            self.subscriptions[environment_id].add(subscription)
+            # The poller may have seen a newer version than the client
+            if environment_id in self.versions:
+                subscription.notify(environment_id, self.versions[environment_id])
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.poll())
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for environment_id in subscription.versions:
+            subscriptions = self.subscriptions.get(environment_id)
+            if subscriptions is None:
+                continue
+
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[environment_id]
+                self.versions.pop(environment_id, None)
+
+    async def poll(self):
+        while self.subscriptions:
+            await asyncio.sleep(settings.CONFITURE_WATCH_POLL_INTERVAL)
+            # There are no requests to recycle the poller's connection
+            await sync_to_async(close_old_connections)()
+
+            try:
+                versions = [
+                    row
+                    async for row in EnvironmentSnapshot.objects.filter(
+                        environment_id__in=list(self.subscriptions)
+                    ).values_list("environment_id", "version")
+                ]
+            except DatabaseError:
+                continue
+
+            for environment_id, version in versions:
+                if self.versions.get(environment_id) == version:
+                    continue
+
+                self.versions[environment_id] = version
+                for subscription in self.subscriptions.get(environment_id, ()):
+                    subscription.notify(environment_id, version)
+
+
+broadcaster = Broadcaster()